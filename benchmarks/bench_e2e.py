@@ -0,0 +1,181 @@
+"""End-to-end fetch throughput against the local ISC stand-in server.
+
+Usage::
+
+    $ python benchmarks/bench_e2e.py [--latency 0.2] [--jitter 0.05]
+          [--error-rate 0.02] [--start-time 20240101] [--end-time 20241231]
+          [--workers 1 4 8] [--rate 1000] [--downloads 20]
+
+An `isc_server.ReplayServer` is started in-process. `biblio-fetch` (once per
+``--workers`` value) and `download_catalog` then run end to end in child
+processes pointed at it through ``EQ_FETCH_ISC_URL``. Events/s and request
+latency come from each child's ``--metrics-json`` output, peak RSS from the
+child's resource usage. Run from the repository root so the event index in
+``data/`` is found.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from rich.console import Console
+from rich.table import Table
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from isc_server import ReplayServer  # noqa: E402
+
+_DOWNLOAD = """
+import json, sys
+from eq_fetch import metrics
+from eq_fetch.temp_refractor.downloader import download_catalog
+
+source, count, directory, out = sys.argv[1], int(sys.argv[2]), sys.argv[3], sys.argv[4]
+collector = metrics.enable()
+for i in range(count):
+    if download_catalog(source, {"out_format": "QuakeML"}, f"{directory}/{i}.xml"):
+        metrics.count("events")
+with open(out, "w") as f:
+    json.dump(collector.to_dict(), f)
+"""
+
+
+def _run(command: list[str], env: dict[str, str]) -> tuple[float, float]:
+    """Run `command` to completion; return wall seconds and peak RSS in MiB."""
+    started = time.perf_counter()
+    child = subprocess.Popen(
+        command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+    )
+    _, status, usage = os.wait4(child.pid, 0)
+    wall = time.perf_counter() - started
+    if os.waitstatus_to_exitcode(status):
+        sys.exit(f"{command[:3]} failed:\n{child.stderr.read().decode()}")
+    child.stderr.close()
+    # ru_maxrss is KiB on Linux and bytes on macOS.
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return wall, usage.ru_maxrss / scale
+
+
+def _row(name: str, workers: str, wall: float, rss: float, path: Path) -> list[str]:
+    data = json.loads(path.read_text())
+    units = data["counters"].get("events", 0)
+    latency = data["histograms"].get("http_latency", {"count": 0})
+
+    def quantile(q: str) -> str:
+        return f"{latency[q] * 1000:.0f}" if latency["count"] else "-"
+
+    return [
+        name,
+        workers,
+        str(units),
+        f"{wall:.2f}",
+        f"{units / data['elapsed']:.1f}",
+        str(data["counters"].get("http_requests", 0)),
+        str(data["counters"].get("http_retries", 0)),
+        quantile("p50"),
+        quantile("p99"),
+        f"{rss:.0f}",
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds")
+    parser.add_argument("--jitter", type=float, default=0.05, help="seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--start-time", default="20240101")
+    parser.add_argument("--end-time", default="20241231")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--rate", type=float, default=1000.0)
+    parser.add_argument("--downloads", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = ReplayServer(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    ).start()
+    env = {**os.environ, "EQ_FETCH_ISC_URL": server.url}
+
+    table = Table(
+        title=f"End-to-end against {server.url} "
+        f"(latency {args.latency * 1000:.0f}+{args.jitter * 1000:.0f} ms, "
+        f"{args.error_rate:.0%} errors)"
+    )
+    for column in [
+        "Run",
+        "Workers",
+        "Events",
+        "Wall (s)",
+        "Events/s",
+        "Requests",
+        "Retries",
+        "p50 (ms)",
+        "p99 (ms)",
+        "Peak RSS (MiB)",
+    ]:
+        table.add_column(column, justify="right")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        for workers in args.workers:
+            metrics_path = tmp / f"biblio-{workers}.json"
+            wall, rss = _run(
+                [
+                    sys.executable,
+                    "-m",
+                    "eq_fetch.biblio",
+                    "--output",
+                    str(tmp / f"biblio-{workers}.csv"),
+                    "--start-time",
+                    args.start_time,
+                    "--end-time",
+                    args.end_time,
+                    "--no-cache",
+                    "--workers",
+                    str(workers),
+                    "--rate",
+                    str(args.rate),
+                    "--metrics-json",
+                    str(metrics_path),
+                ],
+                env,
+            )
+            table.add_row(*_row("biblio-fetch", str(workers), wall, rss, metrics_path))
+
+        if args.downloads:
+            metrics_path = tmp / "download.json"
+            wall, rss = _run(
+                [
+                    sys.executable,
+                    "-c",
+                    _DOWNLOAD,
+                    "bulletin",
+                    str(args.downloads),
+                    str(tmp),
+                    str(metrics_path),
+                ],
+                env,
+            )
+            table.add_row(*_row("download_catalog", "1", wall, rss, metrics_path))
+
+    server.shutdown()
+    server.server_close()
+    console = Console()
+    console.print(table)
+    console.print(
+        f"Server: {server.stats['requests']} requests, "
+        f"{server.stats['errors']} injected errors, "
+        f"{server.stats['bytes'] / 1024:.0f} KiB sent"
+    )
+
+
+if __name__ == "__main__":
+    main()
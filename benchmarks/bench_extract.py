@@ -0,0 +1,66 @@
+"""Micro-benchmark of the bibliography page extractor against BeautifulSoup.
+
+Usage::
+
+    $ python benchmarks/bench_extract.py [PAGES_DIR] [--repeat N]
+
+Every `*.html` page in PAGES_DIR (default: fixtures/FormatBibprint) is
+parsed both ways; the entries must match exactly before timings are shown.
+"""
+
+import argparse
+import sys
+import timeit
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+from rich.console import Console
+from rich.table import Table
+
+from eq_fetch.biblio import _parse_bulletin
+from eq_fetch.extract import page_text
+
+_PAGES_DIR = Path(__file__).parent / "fixtures" / "FormatBibprint"
+
+
+def _soup_entries(html: str) -> list[str]:
+    return _parse_bulletin(BeautifulSoup(html, "html.parser").get_text())
+
+
+def _fast_entries(html: str) -> list[str]:
+    return _parse_bulletin(page_text(html))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("pages", nargs="?", type=Path, default=_PAGES_DIR)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    pages = sorted(args.pages.glob("*.html"))
+    if not pages:
+        sys.exit(f"No *.html pages found in {args.pages}")
+
+    table = Table(title=f"Bibliography page extraction ({args.repeat} runs)")
+    for column in ["Page", "KiB", "Entries", "bs4 (ms)", "extract (ms)", "Speed-up"]:
+        table.add_column(column, justify="right")
+    for page in pages:
+        html = page.read_text(encoding="utf-8")
+        entries = _soup_entries(html)
+        if _fast_entries(html) != entries:
+            sys.exit(f"Extractor output differs from BeautifulSoup for {page.name}")
+        soup = timeit.timeit(lambda: _soup_entries(html), number=args.repeat)
+        fast = timeit.timeit(lambda: _fast_entries(html), number=args.repeat)
+        table.add_row(
+            page.stem,
+            f"{len(html) / 1024:.1f}",
+            str(len(entries)),
+            f"{soup / args.repeat * 1e3:.3f}",
+            f"{fast / args.repeat * 1e3:.3f}",
+            f"{soup / fast:.1f}x",
+        )
+    Console().print(table)
+
+
+if __name__ == "__main__":
+    main()
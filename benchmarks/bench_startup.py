@@ -0,0 +1,114 @@
+"""CLI startup time and the heavy modules each command loads before it exits.
+
+Usage::
+
+    $ python benchmarks/bench_startup.py [--repeat 15] [--budget 250]
+
+Each command is run ``--repeat`` times in a fresh interpreter. The median
+wall time of a bare ``python -c pass`` is reported as the baseline, and
+every command's median above that baseline must stay within ``--budget``
+milliseconds. Importing click, rich and rich-click and rendering a rich
+help screen of some 30 options takes about 170 ms over the baseline before
+any eq-fetch code runs, so the budget leaves the package itself about 80 ms. Commands that only print help or reject their arguments must
+also never import pandas, obspy, requests, numpy, pyarrow or the
+Flinn-Engdahl tables; the script exits non-zero if any check fails.
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+from rich.console import Console
+from rich.table import Table
+
+_HEAVY = ("pandas", "obspy", "requests", "numpy", "pyarrow", "flinnengdahl")
+
+_COMMANDS = {
+    "biblio-fetch --help": ["-m", "eq_fetch.biblio", "--help"],
+    "biblio-fetch usage error": ["-m", "eq_fetch.biblio", "--workers", "0"],
+    "eq-fetch --help": ["-m", "eq_fetch.cli", "--help"],
+    "eq-fetch index --help": ["-m", "eq_fetch.cli", "index", "--help"],
+}
+
+
+def _wall(args: list[str], repeat: int) -> float:
+    """Median wall milliseconds of `python <args>` over `repeat` runs."""
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        subprocess.run(
+            [sys.executable, *args],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        times.append((time.perf_counter() - started) * 1000)
+    return statistics.median(times)
+
+
+def _imports(args: list[str]) -> dict[str, float]:
+    """Cumulative import milliseconds of each top-level package `args` loads."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    packages: dict[str, float] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        root = name.strip().split(".")[0]
+        packages[root] = max(packages.get(root, 0.0), int(cumulative) / 1000)
+    return packages
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=15)
+    parser.add_argument("--budget", type=float, default=250.0, help="milliseconds")
+    args = parser.parse_args()
+
+    baseline = _wall(["-c", "pass"], args.repeat)
+    preloaded = _imports(["-c", "pass"])
+    table = Table(
+        title=f"Startup, median of {args.repeat} "
+        f"(bare interpreter {baseline:.0f} ms, budget {args.budget:.0f} ms)"
+    )
+    table.add_column("Command")
+    table.add_column("Wall (ms)", justify="right")
+    table.add_column("Over baseline (ms)", justify="right")
+    table.add_column("Slowest imports")
+    table.add_column("Heavy modules")
+
+    failed = False
+    for name, command in _COMMANDS.items():
+        wall = _wall(command, args.repeat)
+        packages = {
+            package: ms
+            for package, ms in _imports(command).items()
+            if package not in preloaded
+        }
+        heavy = [package for package in _HEAVY if package in packages]
+        slowest = sorted(packages.items(), key=lambda item: -item[1])[:3]
+        over = wall - baseline
+        ok = over <= args.budget and not heavy
+        failed |= not ok
+        table.add_row(
+            name,
+            f"{wall:.0f}",
+            f"[{'green' if over <= args.budget else 'red'}]{over:.0f}",
+            ", ".join(f"{package} {ms:.0f}" for package, ms in slowest),
+            f"[red]{', '.join(heavy)}" if heavy else "[green]none",
+        )
+
+    Console().print(table)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
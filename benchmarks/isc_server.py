@@ -0,0 +1,217 @@
+"""Local stand-in for the ISC web services, replaying recorded responses.
+
+Usage::
+
+    $ python benchmarks/isc_server.py [--port 8765] [--latency 0.2]
+          [--jitter 0.05] [--error-rate 0.02]
+
+Point eq_fetch at it with ``EQ_FETCH_ISC_URL=http://127.0.0.1:8765``.
+Responses come from `fixtures/`:
+
+- ``/cgi-bin/FormatBibprint.pl?evid=<evid>`` serves
+  ``FormatBibprint/<evid>.html``, or one of the recorded pages chosen by
+  event id when that event was not recorded.
+- ``/cgi-bin/bibsearch.pl`` and ``/event_bibliography/index.php`` serve
+  the ``bibsearch/`` pages.
+- ``/cgi-bin/web-db-run`` and ``/iscbulletin/search/catalogue/`` serve the
+  ``web-db-run/`` QuakeML documents.
+
+Every response is delayed by ``latency`` plus up to ``jitter`` seconds, and
+a fraction ``error_rate`` of requests fail with a 503. With ``capacity``,
+requests beyond that many in flight are refused with a 503 as an overloaded
+server would, carrying ``Retry-After: <retry_after>`` when it is set, and a
+fraction ``busy_rate`` of pages are replaced by the ISC "cannot be
+processed" page.
+"""
+
+import argparse
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+_FIXTURES = Path(__file__).parent / "fixtures"
+
+_BUSY_PAGE = (
+    b"<html><body><p>Sorry, your request cannot be processed at the present time."
+    b" Please try again later.</p></body></html>\n"
+)
+
+_ROUTES = {
+    "/cgi-bin/FormatBibprint.pl": ("FormatBibprint", "*.html", "text/html"),
+    "/cgi-bin/bibsearch.pl": ("bibsearch", "*.html", "text/html"),
+    "/event_bibliography/index.php": ("bibsearch", "*.html", "text/html"),
+    "/cgi-bin/web-db-run": ("web-db-run", "*.xml", "text/xml"),
+    "/iscbulletin/search/catalogue/": ("web-db-run", "*.xml", "text/xml"),
+}
+
+
+class ReplayServer(ThreadingHTTPServer):
+    """Threaded HTTP server replaying fixture responses with injected faults."""
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: tuple[str, int] = ("127.0.0.1", 0),
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        fixtures: Path = _FIXTURES,
+        seed: int | None = None,
+        capacity: int | None = None,
+        retry_after: float | None = None,
+        busy_rate: float = 0.0,
+    ):
+        super().__init__(address, _Handler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.capacity = capacity
+        self.retry_after = retry_after
+        self.busy_rate = busy_rate
+        self.active = 0
+        self.pages = {
+            route: {
+                path.stem: path.read_bytes()
+                for path in sorted((fixtures / folder).glob(pattern))
+            }
+            for route, (folder, pattern, _) in _ROUTES.items()
+        }
+        self.stats: Counter = Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "ReplayServer":
+        """Serve from a daemon thread and return self."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def record(self, key: str, n: int = 1) -> None:
+        with self._lock:
+            self.stats[key] += n
+
+    def _draw(self) -> tuple[float, bool, bool]:
+        with self._lock:
+            delay = self.latency + self._random.uniform(0, self.jitter)
+            fail = self._random.random() < self.error_rate
+            return delay, fail, self._random.random() < self.busy_rate
+
+    def enter(self) -> bool:
+        """Count a request in; False if it exceeds `capacity`."""
+        with self._lock:
+            self.active += 1
+            self.stats["peak_active"] = max(self.stats["peak_active"], self.active)
+            return self.capacity is None or self.active <= self.capacity
+
+    def leave(self) -> None:
+        with self._lock:
+            self.active -= 1
+
+    def respond(self, path: str, query: dict[str, list[str]]) -> bytes | None:
+        pages = self.pages.get(path)
+        if not pages:
+            return None
+        if path == "/cgi-bin/FormatBibprint.pl":
+            evid = query.get("evid", ["0"])[0]
+            if evid in pages:
+                return pages[evid]
+            keys = sorted(pages)
+            return pages[keys[int(evid) % len(keys)]] if evid.isdigit() else None
+        return next(iter(pages.values()))
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: ReplayServer
+    protocol_version = "HTTP/1.1"
+    # Send headers and body in one segment; separate small writes stall on
+    # Nagle plus delayed ACKs and would inflate every measured latency.
+    wbufsize = 64 * 1024
+
+    def do_GET(self):
+        admitted = self.server.enter()
+        try:
+            self._get(admitted)
+        finally:
+            self.server.leave()
+
+    def _get(self, admitted: bool):
+        parts = urlsplit(self.path)
+        delay, fail, busy = self.server._draw()
+        time.sleep(delay)
+        self.server.record("requests")
+        if not admitted:
+            self.server.record("overloaded")
+            self._send(503, b"Service temporarily unavailable\n", "text/plain")
+            return
+        if fail:
+            self.server.record("errors")
+            self._send(503, b"Service temporarily unavailable\n", "text/plain")
+            return
+        if busy:
+            self.server.record("busy")
+            self._send(200, _BUSY_PAGE, "text/html; charset=utf-8")
+            return
+        body = self.server.respond(parts.path, parse_qs(parts.query))
+        if body is None:
+            self.server.record("not_found")
+            self._send(404, b"Not found\n", "text/plain")
+            return
+        self._send(200, body, _ROUTES[parts.path][2] + "; charset=utf-8")
+
+    def _send(self, status: int, body: bytes, content_type: str) -> None:
+        self.send_response(status)
+        if status == 503 and self.server.retry_after is not None:
+            self.send_header("Retry-After", f"{self.server.retry_after:g}")
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.record("bytes", len(body))
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--capacity", type=int, help="concurrent requests")
+    parser.add_argument("--retry-after", type=float, help="seconds")
+    parser.add_argument("--busy-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = ReplayServer(
+        (args.host, args.port),
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        seed=args.seed,
+        capacity=args.capacity,
+        retry_after=args.retry_after,
+        busy_rate=args.busy_rate,
+    )
+    print(f"Replaying {_FIXTURES} on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
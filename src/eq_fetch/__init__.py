@@ -1,8 +1,12 @@
-from typing import TypedDict, Literal
-from obspy.core.utcdatetime import UTCDateTime
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, TypedDict, Literal
 from pathlib import Path
 import argparse
-import rich_click as click
+import click
+
+if TYPE_CHECKING:
+    from obspy.core.utcdatetime import UTCDateTime
 
 
 class BibliographyCriteria(argparse.Namespace):
@@ -16,8 +20,13 @@ class BibliographyCriteria(argparse.Namespace):
     mags: list[float]
     journal: str
     author: str
+    doi: str
 
     def __init__(self):
+        # obspy is imported here rather than at module level: every command
+        # imports this package, and --help should not pay for obspy.
+        from obspy.core.utcdatetime import UTCDateTime
+
         self.output = Path("./bibliographies.csv")
         self.start_time = UTCDateTime("1800/01/01")
         self.end_time = UTCDateTime("2025/12/31")
@@ -27,6 +36,7 @@ class BibliographyCriteria(argparse.Namespace):
         self.mags = [10e-10, 10]
         self.journal = ""
         self.author = ""
+        self.doi = ""
         super().__init__()
 
 
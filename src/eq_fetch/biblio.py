@@ -1,33 +1,220 @@
+from __future__ import annotations
+
 import contextlib
-import csv
-import random
+import importlib.util
+import math
 import sqlite3
 import sys
 import time
+from datetime import timedelta
 from pathlib import Path
+from typing import TYPE_CHECKING, Callable
 
-import flinnengdahl
-import pandas as pd
-import requests
 import rich_click as click
-from bs4 import BeautifulSoup
-from obspy.core.utcdatetime import UTCDateTime
 from rich.console import Console
-from rich.progress import track
 
-from eq_fetch import BibliographyCriteria, RangeParams
+from eq_fetch import BibliographyCriteria, RangeParams, metrics
+from eq_fetch.cache import _CACHE_PATH
+from eq_fetch.index import _DB_PATH, ORDERS, build_event_query, query_plan
+from eq_fetch.index import connect as connect_index
+from eq_fetch.quarantine import _QUARANTINE_DIR
+from eq_fetch.writer import ARROW_FORMATS
+
+# pandas, obspy, requests, the region tables and the fetch machinery are
+# imported where they are first used, so --help and usage errors return
+# without loading them.
+if TYPE_CHECKING:
+    import pandas as pd
+    from obspy.core.utcdatetime import UTCDateTime
+
+    from eq_fetch import bulk, shards
+    from eq_fetch.cache import BibliographyCache
+    from eq_fetch.fetcher import TokenBucket
+    from eq_fetch.quarantine import Quarantine
+    from eq_fetch.writer import StreamingArrowWriter, StreamingCSVWriter
 
 console = Console()
-_DB_PATH = Path("data/event_index.db")
+_CSV_HEADER = [
+    "ISC_event",
+    "Origin_Time",
+    "Mag",
+    "Lat",
+    "Lon",
+    "Dep",
+    "Region",
+    "DOI_link",
+    "Bibliography_Entry",
+]
+
+_SUFFIX_FORMATS = {
+    ".parquet": "parquet",
+    ".pq": "parquet",
+    ".feather": "feather",
+    ".arrow": "feather",
+}
 
+# Seconds a bibliography request is assumed to take when estimating how
+# long a run will be; the real latency is only known once it starts.
+_ASSUMED_LATENCY = 1.0
+
+
+def _arrow_schema():
+    """Typed columns for Parquet and Feather output, in `_CSV_HEADER` order."""
+    import pyarrow as pa
+
+    region = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema(
+        [
+            ("ISC_event", pa.int64()),
+            ("Origin_Time", pa.timestamp("us", tz="UTC")),
+            ("Mag", pa.float32()),
+            ("Lat", pa.float32()),
+            ("Lon", pa.float32()),
+            ("Dep", pa.float32()),
+            ("Region", region),
+            ("DOI_link", pa.string()),
+            ("Bibliography_Entry", pa.string()),
+        ]
+    )
+
+
+def _prepare_events(events_df: pd.DataFrame) -> list[tuple[str, ...]]:
+    """Format event metadata column-wise into output-ready string tuples."""
+    import pandas as pd
+
+    from eq_fetch.regions import region_names
+
+    origin = pd.to_datetime(events_df["Origin_Time"], unit="s")
+    origin_time = origin.dt.strftime("%Y-%m-%dT%H:%M:%S").where(
+        origin.dt.microsecond == 0,
+        origin.dt.strftime("%Y-%m-%dT%H:%M:%S.%f"),
+    )
+
+    def as_str(column: str) -> list[str]:
+        return [str(value) for value in events_df[column].tolist()]
+
+    with metrics.timer("region_lookup"):
+        regions = region_names(events_df["Lat"], events_df["Lon"])
+    return list(
+        zip(
+            events_df["ISC_event"].astype(str).tolist(),
+            origin_time.tolist(),
+            as_str("Mag"),
+            as_str("Lat"),
+            as_str("Lon"),
+            as_str("Depth"),
+            regions,
+        )
+    )
 
-def fetch_bibliographies(event_id: str) -> list[str]:
-    base_url = "https://www.isc.ac.uk/cgi-bin/FormatBibprint.pl"
+
+def _estimate(planned: int, rate: float | None, workers: int) -> timedelta:
+    """Rough run time of `planned` requests in rounds of `workers` at a time.
+
+    Each round is assumed to take `_ASSUMED_LATENCY` seconds, and `rate`
+    caps the pace when given. The adaptive limiter ramps up to `workers`
+    within a few round trips, so its start is ignored.
+    """
+    seconds = math.ceil(planned / workers) * _ASSUMED_LATENCY
+    if rate:
+        seconds = max(seconds, planned / rate)
+    return timedelta(seconds=round(seconds))
+
+
+def _explain(
+    conn: sqlite3.Connection,
+    query: str,
+    params: list,
+    events_df: pd.DataFrame,
+    cached: int,
+    windows: list[bulk.Window],
+    planned: int,
+    rate: float | None,
+    workers: int,
+) -> None:
+    """Print what a run would fetch and how the index answers the query."""
+    from rich.table import Table
+
+    table = Table(title="Dry run", show_header=False)
+    table.add_column(style="bold")
+    table.add_column(justify="right")
+    table.add_row("Matched events", str(len(events_df)))
+    table.add_row("Expected reference rows", str(int(events_df["N"].sum())))
+    unknown = int(events_df["N"].isna().sum())
+    if unknown:
+        table.add_row("Events with unknown reference count", str(unknown))
+    table.add_row("Already cached", str(cached))
+    if windows:
+        covered = sum(len(window.events) for window in windows)
+        table.add_row("Bulk pages (events covered)", f"{len(windows)} ({covered})")
+    table.add_row("Requests", str(planned))
+    if rate:
+        table.add_row(
+            f"Shortest time at {rate:g} requests/s",
+            str(timedelta(seconds=round(planned / rate))),
+        )
+    else:
+        table.add_row("Pace", f"adaptive, up to {workers} in flight")
+    table.add_row(
+        f"Estimated time (assuming {_ASSUMED_LATENCY:g} s per request)",
+        f"~{_estimate(planned, rate, workers)}",
+    )
+    console.print(table)
+    console.print("[bold]Query plan[/bold]")
+    for line in query_plan(conn, query, params):
+        console.print(f"  {line}", markup=False, highlight=False)
+
+
+def fetch_bibliographies(
+    event_id: str,
+    limiter: TokenBucket | None = None,
+    cache: BibliographyCache | None = None,
+    refresh: bool = False,
+    cache_only: bool = False,
+    quarantine: Quarantine | None = None,
+) -> list[str] | None:
+    """Return the bibliography entries of `event_id`.
+
+    None means the page could not be fetched; the event is not done and a
+    resumed run should try it again. A quarantined page yields no entries.
+    """
+    import requests
+
+    from eq_fetch import transport
+    from eq_fetch.extract import page_text
+
+    if cache and not refresh:
+        with metrics.timer("cache_read"):
+            cached = cache.get(event_id)
+        if cached is not None:
+            metrics.count("cache_hits")
+            return cached
+        metrics.count("cache_misses")
+    if cache_only:
+        return []
+
+    base_url = transport.isc_url("cgi-bin/FormatBibprint.pl")
     url: str = f"{base_url}?evid={event_id}"
-    bibliographies: list[str] = []
+    bibliographies: list[str] | None = None
 
     try:
-        _scrape_bulletin(url, bibliographies)
+        if limiter:
+            with metrics.timer("rate_limit_wait"):
+                limiter.acquire()
+        html = _scrape_bulletin(url)
+        with metrics.timer("parse"):
+            bibliographies = _parse_bulletin(page_text(html))
+        if cache:
+            with metrics.timer("cache_write"):
+                cache.put(event_id, bibliographies)
+    except BulletinFormatError as e:
+        bibliographies = []
+        metrics.count("quarantined")
+        if quarantine:
+            quarantine.add(event_id, html, str(e), url)
+        console.print(
+            f"[bold yellow]Quarantined bibliography page for event {event_id}: {e}[/bold yellow]"
+        )
     except requests.exceptions.RequestException as e:
         console.print(
             f"[bold red]Error fetching bibliography for event {event_id}: {e}[/bold red]"
@@ -39,83 +226,509 @@ def fetch_bibliographies(event_id: str) -> list[str]:
     return bibliographies
 
 
-def _scrape_bulletin(url: str, bibliographies: list[str]):
-    response = requests.get(url, timeout=10)
+def _scrape_bulletin(url: str) -> str:
+    import requests
+
+    from eq_fetch import transport
+
+    response = transport.get(url, timeout=10)
     response.raise_for_status()
+    if transport._busy(response, stream=False):
+        # A refetch, not a better parser, fixes these; keep them out of quarantine.
+        raise requests.exceptions.RetryError(f"server still busy for {url}")
+    return response.text
+
 
-    soup = BeautifulSoup(response.text, "html.parser")
+class BulletinFormatError(ValueError):
+    """A FormatBibprint page whose layout the parser does not recognise."""
 
-    text_content = soup.get_text()
+
+def _parse_bulletin(text_content: str) -> list[str]:
     lines = text_content.splitlines()
+    if len(lines) < 26:
+        raise BulletinFormatError(f"page has {len(lines)} lines, expected at least 26")
 
-    if len(lines[24].split()) == 17:
+    fields = len(lines[24].split())
+    if fields == 17:
         lines[25] = lines[25][91:]
-    elif len(lines[24].split()) == 19:
+    elif fields == 19:
         lines[25] = lines[25][107:]
     else:
-        print(f"{len(lines[24].split())=}")
-        sys.exit(0)
+        raise BulletinFormatError(
+            f"event header (line 25) has {fields} fields, expected 17 or 19"
+        )
 
-    bibliographies.extend(line.strip() for line in lines[25:-10] if line)
-    time.sleep(round(random.uniform(0.45, 0.55), 2))
+    return [line.strip() for line in lines[25:-10] if line]
 
 
-@click.command(context_settings={"help_option_names": ["-h", "--help"]})
-@click.option(
-    "--output",
-    "-o",
-    type=click.Path(dir_okay=False, writable=True),
-    default="bibliographies.csv",
-    show_default=True,
-    help="Path to the output CSV file.",
-)
-@click.option(
-    "--start-time",
-    type=click.DateTime(formats=["%Y%m%d %H:%M:%S", "%Y%m%d"]),
-    help="Start origin time (YYYYMMDD hh:mm:ss or YYYYMMDD).",
-)
-@click.option(
-    "--end-time",
-    type=click.DateTime(formats=["%Y%m%d %H:%M:%S", "%Y%m%d"]),
-    help="End origin time (YYYYMMDD hh:mm:ss or YYYYMMDD).",
-)
-@click.option(
-    "--lats",
-    type=RangeParams(),
-    help="Central latitude or latitude range. Provide 1 or 2 values separated by spaces.",
-)
-@click.option(
-    "--lons",
-    type=RangeParams(),
-    help="Central longitude or longitude range. Provide 1 or 2 values separated by spaces.",
-)
-@click.option(
-    "--deps",
-    type=RangeParams(),
-    help="Central depth or depth range in km. Provide 1 or 2 values separated by spaces.",
-)
-@click.option(
-    "--mags",
-    type=RangeParams(),
-    help="Central magnitude or magnitude range. Provide 1 or 2 values separated by spaces.",
-)
-@click.option("--journal", type=str, help="Select Journal Name.")
-@click.option("--author", type=str, help="Select Author Name.")
-def main(
+def _weights(events_df: pd.DataFrame) -> pd.Series:
+    # N is the ISC reference count; unknown counts weigh as one row.
+    return events_df["N"].fillna(1).clip(lower=1).astype(int)
+
+
+def _event_rows(event: tuple[str, ...], bibliographies: list[str]) -> list[list[str]]:
+    event_id, origin_time, max_mag, lat, lon, dep, region = event
+    rows = []
+    for bib_entry in bibliographies:
+        doi_link = ""
+        with contextlib.suppress(IndexError):
+            doi_link = "http://dx.doi.org/" + bib_entry.split("DOI:")[1].strip()
+        rows.append(
+            [
+                event_id,
+                origin_time,
+                max_mag,
+                lat,
+                lon,
+                dep,
+                region,
+                doi_link,
+                bib_entry,
+            ]
+        )
+    return rows
+
+
+def _open_writer(
+    path: Path,
+    output_format: str,
+    append: bool = False,
+    on_flush: Callable[[list[str]], None] | None = None,
+) -> StreamingCSVWriter | StreamingArrowWriter:
+    from eq_fetch.writer import StreamingArrowWriter, StreamingCSVWriter
+
+    if output_format == "csv":
+        return StreamingCSVWriter(path, _CSV_HEADER, append=append, on_flush=on_flush)
+    return StreamingArrowWriter(
+        path, _arrow_schema(), fmt=output_format, append=append, on_flush=on_flush
+    )
+
+
+def _open_cache(
+    cache_path: str,
+    no_cache: bool,
+    filtering: bool,
+    cache_ttl: float,
+    cache_size: int,
+) -> BibliographyCache | None:
+    from eq_fetch.cache import BibliographyCache
+
+    if not no_cache:
+        return BibliographyCache(
+            Path(cache_path), ttl_days=cache_ttl, max_bytes=cache_size * 1024 * 1024
+        )
+    if filtering:
+        # Predicates are evaluated by the store, so keep a throwaway one.
+        return BibliographyCache(":memory:", ttl_days=None, max_bytes=None)
+    return None
+
+
+def _fetcher(
+    limiter: TokenBucket | None,
+    cache: BibliographyCache | None,
+    refresh: bool,
+    cache_only: bool,
+    journal: str,
+    author: str,
+    doi: str,
+    prefetched: dict[str, list[str]] | None = None,
+    quarantine: Quarantine | None = None,
+) -> Callable[[tuple[tuple[str, ...], int]], list[str] | None]:
+    filtering = bool(journal or author or doi)
+    prefetched = prefetched if prefetched is not None else {}
+
+    def fetch(item: tuple[tuple[str, ...], int]) -> list[str] | None:
+        event_id = item[0][0]
+        bibliographies = prefetched.pop(event_id, None)
+        if bibliographies is None:
+            bibliographies = fetch_bibliographies(
+                event_id,
+                limiter,
+                cache=cache,
+                refresh=refresh,
+                cache_only=cache_only,
+                quarantine=quarantine,
+            )
+        if bibliographies is None:
+            return None
+        if filtering:
+            with metrics.timer("store_filter"):
+                return cache.matching(event_id, journal=journal, author=author, doi=doi)
+        return bibliographies
+
+    return fetch
+
+
+def _bulk_plan(
+    conn: sqlite3.Connection, events_df: pd.DataFrame, skip: set[str]
+) -> tuple[list[bulk.Window], list[str]]:
+    """Plan bibsearch.pl windows for the events of `events_df` not in `skip`."""
+    from eq_fetch import bulk
+
+    needed = [
+        (evid, origin)
+        for evid, origin in zip(
+            events_df["ISC_event"].astype(str), events_df["Origin_Time"].tolist()
+        )
+        if evid not in skip
+    ]
+    if len(needed) < 2:
+        return [], [evid for evid, _ in needed]
+    origins = [origin for _, origin in needed]
+    with metrics.timer("bulk_plan"):
+        times = bulk.referenced_times(conn, min(origins), max(origins))
+        return bulk.plan_windows(needed, times)
+
+
+def _requests(
+    events_df: pd.DataFrame, cached: set[str], windows: list[bulk.Window]
+) -> int:
+    covered = sum(len(window.events) for window in windows)
+    return len(events_df) - len(cached) - covered + len(windows)
+
+
+def _schedule(
+    event_ids: list[str], windows: list[bulk.Window]
+) -> list[bulk.Window | str]:
+    """Order bulk pages and single events by the run's priority.
+
+    `event_ids` is in run order. Each window takes the place of its first
+    event there, and events outside every window keep their own.
+    """
+    from eq_fetch import bulk
+
+    window_of = {evid: n for n, window in enumerate(windows) for evid in window.events}
+    jobs: list[bulk.Window | str] = []
+    scheduled: set[int] = set()
+    for evid in event_ids:
+        n = window_of.get(evid)
+        if n is None:
+            jobs.append(evid)
+        elif n not in scheduled:
+            scheduled.add(n)
+            jobs.append(windows[n])
+    return jobs
+
+
+def _write_windows(
+    windows: list[bulk.Window],
+    events_df: pd.DataFrame,
+    fetch: Callable[[tuple[tuple[str, ...], int]], list[str] | None],
+    prefetched: dict[str, list[str]],
+    limiter: TokenBucket | None,
+    cache: BibliographyCache | None,
+    writer: StreamingCSVWriter | StreamingArrowWriter,
+    workers: int,
+    keep_going: Callable[[], bool],
+    failed: list[str],
+) -> tuple[bool, pd.DataFrame]:
+    """Fetch and write `events_df` in run order, bulk pages among them.
+
+    Each page is scheduled where its highest-priority event falls in the
+    run's order, and writes its events as it arrives; events outside every
+    window are fetched one by one in between. Only the pages in flight are
+    held. Return False if `keep_going` stopped it, and the events left over
+    for the per-event endpoint: those on a failed page or missing from their
+    page (which happens when it hit the 500-event cap). Events whose own
+    fetch failed are appended to `failed`.
+    """
+    import requests
+    from rich.progress import Progress
+
+    from eq_fetch import bulk, transport
+    from eq_fetch.fetcher import fetch_ordered
+
+    def fetch_window(window: bulk.Window) -> dict[str, list[str]] | None:
+        try:
+            if limiter:
+                with metrics.timer("rate_limit_wait"):
+                    limiter.acquire()
+            response = transport.get(bulk.window_url(window), timeout=60)
+            response.raise_for_status()
+            with metrics.timer("parse"):
+                return bulk.parse_page(response.text)
+        except requests.exceptions.RequestException as e:
+            console.print(f"[bold red]Error fetching bulk page: {e}[/bold red]")
+            return None
+        except (ValueError, IndexError) as e:
+            # An unreadable page costs its events a request each, not the run.
+            console.print(
+                f"[bold yellow]Unreadable bulk page {window.start}-{window.end} ({e}); fetching its events one by one.[/bold yellow]"
+            )
+            return None
+
+    events = list(zip(_prepare_events(events_df), _weights(events_df).tolist()))
+    position = {event[0]: n for n, (event, _) in enumerate(events)}
+    jobs = [
+        (job, None) if isinstance(job, bulk.Window) else (None, events[position[job]])
+        for job in _schedule([event[0] for event, _ in events], windows)
+    ]
+
+    def run(job):
+        window, item = job
+        return fetch_window(window) if window else fetch(item)
+
+    leftover: list[str] = []
+    fetched = fetch_ordered(run, jobs, workers=workers)
+    with Progress(console=console) as progress:
+        task = progress.add_task(
+            "Fetching bibliographies...", total=sum(weight for _, weight in events)
+        )
+        for (window, item), result in fetched:
+            if window is None:
+                event, weight = item
+                if result is None:
+                    failed.append(event[0])
+                    metrics.count("failed_events")
+                else:
+                    with metrics.timer("write"):
+                        writer.write_event(event[0], _event_rows(event, result))
+                    metrics.count("events")
+                progress.advance(task, weight)
+            elif result is None:
+                metrics.count("bulk_failed")
+                leftover.extend(window.events)
+                progress.advance(
+                    task, sum(events[position[evid]][1] for evid in window.events)
+                )
+            else:
+                metrics.count("bulk_pages")
+                # Rows follow the run's order within the window.
+                for evid in sorted(window.events, key=position.__getitem__):
+                    event, weight = events[position[evid]]
+                    if evid not in result:
+                        # Fetched one by one after the pages.
+                        leftover.append(evid)
+                        progress.advance(task, weight)
+                        continue
+                    prefetched[evid] = result[evid]
+                    if cache:
+                        with metrics.timer("cache_write"):
+                            cache.put(evid, result[evid])
+                    bibliographies = fetch((event, weight))
+                    with metrics.timer("write"):
+                        writer.write_event(evid, _event_rows(event, bibliographies))
+                    metrics.count("events")
+                    metrics.count("bulk_events")
+                    progress.advance(task, weight)
+            if not keep_going():
+                fetched.close()
+                return False, events_df.iloc[:0]
+    return True, events_df[events_df["ISC_event"].astype(str).isin(leftover)]
+
+
+def _write_events(
+    events_df: pd.DataFrame,
+    fetch: Callable[[tuple[tuple[str, ...], int]], list[str] | None],
+    writer: StreamingCSVWriter | StreamingArrowWriter,
+    workers: int,
+    keep_going: Callable[[], bool],
+    failed: list[str],
+    description: str = "Fetching bibliographies...",
+) -> bool:
+    """Fetch and write `events_df` in order; False if `keep_going` stopped it.
+
+    The caller opens and closes `writer`. Events whose fetch failed are not
+    written, so the writer never reports them done; their ids are appended
+    to `failed`.
+    """
+    from rich.progress import Progress
+
+    from eq_fetch.fetcher import fetch_ordered
+
+    weights = _weights(events_df).tolist()
+    fetched = fetch_ordered(
+        fetch,
+        zip(_prepare_events(events_df), weights),
+        workers=workers,
+    )
+    with Progress(console=console) as progress:
+        task = progress.add_task(description, total=sum(weights))
+        for (event, weight), bibliographies in fetched:
+            if bibliographies is None:
+                failed.append(event[0])
+                metrics.count("failed_events")
+            else:
+                with metrics.timer("write"):
+                    writer.write_event(event[0], _event_rows(event, bibliographies))
+                metrics.count("events")
+            progress.advance(task, weight)
+            if not keep_going():
+                fetched.close()
+                return False
+    return True
+
+
+def _reprocess_quarantine(
+    quarantine: Quarantine, conn: sqlite3.Connection, store: BibliographyCache
+) -> None:
+    """Parse quarantined pages again and append what they yield to their runs.
+
+    Recovered entries go into `store` first, so later runs read them from
+    the cache and the run's entry filters can be applied. Pages that still
+    fail, or whose event is not in the local index, stay quarantined.
+    """
+    import pandas as pd
+
+    from eq_fetch import shards
+    from eq_fetch.extract import page_text
+
+    runs: dict[tuple, dict[str, list[str]]] = {}
+    failed = 0
+    for record, html in quarantine.records():
+        try:
+            entries = _parse_bulletin(page_text(html))
+        except BulletinFormatError as e:
+            quarantine.retain(record, str(e))
+            failed += 1
+            continue
+        store.put(record["evid"], entries)
+        run = tuple(
+            record.get(key) for key in ("output", "format", "journal", "author", "doi")
+        )
+        runs.setdefault(run, {})[record["evid"]] = entries
+
+    recovered = 0
+    for (output, fmt, journal, author, doi), pages in runs.items():
+        placeholders = ", ".join("?" * len(pages))
+        events_df = pd.read_sql_query(
+            f"SELECT {', '.join(shards.EVENT_COLUMNS)} FROM isc_events"
+            f" WHERE ISC_event IN ({placeholders}) ORDER BY ISC_event",
+            conn,
+            params=[int(event_id) for event_id in pages],
+        )
+        missing = set(pages) - set(events_df["ISC_event"].astype(str))
+        if missing:
+            console.print(
+                f"[bold yellow]{len(missing)} quarantined events are not in the local index; kept for later.[/bold yellow]"
+            )
+        if events_df.empty:
+            continue
+        path = Path(output)
+        with _open_writer(path, fmt, append=path.exists()) as writer:
+            for event in _prepare_events(events_df):
+                event_id = event[0]
+                entries = pages[event_id]
+                if journal or author or doi:
+                    entries = store.matching(
+                        event_id, journal=journal, author=author, doi=doi
+                    )
+                writer.write_event(event_id, _event_rows(event, entries))
+        for event_id in events_df["ISC_event"].astype(str):
+            quarantine.remove(event_id)
+        recovered += len(events_df)
+        console.print(
+            f"[bold green]Appended {len(events_df)} recovered events to {path}[/bold green]"
+        )
+    console.print(
+        f"[bold green]Reprocessed quarantine {quarantine.directory}: {recovered} pages recovered, {failed} still unparseable.[/bold green]"
+    )
+
+
+def _report_quarantine(quarantine: Quarantine) -> None:
+    if quarantine.added:
+        console.print(
+            f"[bold yellow]{quarantine.added} unparseable pages saved to {quarantine.directory}; "
+            "after updating the parser, run with --reprocess-quarantine to recover them.[/bold yellow]"
+        )
+
+
+def _work_shards(
+    queue: shards.WorkQueue,
+    fetch: Callable[[tuple[tuple[str, ...], int]], list[str] | None],
+    workers: int,
+    lease: float,
+    deadline: float | None,
+) -> tuple[int, list[int]]:
+    """Claim and fetch shards until none are left.
+
+    Return how many shards were done and the shards released because some
+    of their events failed; those are not claimed again by this worker.
+    """
+    import pandas as pd
+
+    from eq_fetch import shards
+
+    owner = shards.default_owner()
+    fmt = queue.meta["format"]
+    done = 0
+    incomplete: list[int] = []
+    while deadline is None or time.monotonic() < deadline:
+        shard = queue.claim(owner, lease, exclude=incomplete)
+        if shard is None:
+            break
+        events_df = pd.DataFrame.from_records(
+            queue.events(shard), columns=shards.EVENT_COLUMNS
+        )
+        output = shards.temp_part(queue, shard, owner)
+        renewed = time.monotonic()
+        held = True
+
+        def keep_going() -> bool:
+            # Renew at a third of the lease so one slow request cannot lose it.
+            nonlocal renewed, held
+            if time.monotonic() - renewed >= lease / 3:
+                held = queue.heartbeat(shard, owner, lease)
+                renewed = time.monotonic()
+            return held and (deadline is None or time.monotonic() < deadline)
+
+        failed: list[str] = []
+        with _open_writer(output, fmt) as writer:
+            finished = _write_events(
+                events_df,
+                fetch,
+                writer,
+                workers,
+                keep_going,
+                failed,
+                description=f"Shard {shard}...",
+            )
+        if finished and not failed:
+            if queue.complete(shard, owner, output):
+                done += 1
+                continue
+            held = False
+        output.unlink(missing_ok=True)
+        if failed and held:
+            incomplete.append(shard)
+            console.print(
+                f"[bold yellow]{len(failed)} events of shard {shard} could not be fetched; returned it to the queue.[/bold yellow]"
+            )
+        if held:
+            queue.release(shard, owner)
+        else:
+            console.print(
+                f"[bold yellow]Lease on shard {shard} expired; another worker took it over.[/bold yellow]"
+            )
+    return done, incomplete
+
+
+def _criteria(
     output: str,
+    output_format: str | None,
     start_time: UTCDateTime,
     end_time: UTCDateTime,
     lats: list[float],
     lons: list[float],
     deps: list[float],
     mags: list[float],
-    author: str,
     journal: str,
-):
-    """Extracts bibliographies for ISC seismic events based on user-specified filters."""
+    author: str,
+    doi: str,
+) -> tuple[BibliographyCriteria, str]:
+    """Build the search criteria and resolve the output format from `--output`."""
+    from obspy.core.utcdatetime import UTCDateTime
+
     search_criteria = BibliographyCriteria()
 
     search_criteria.output = Path(output)
+    output_format = output_format or _SUFFIX_FORMATS.get(
+        search_criteria.output.suffix.lower(), "csv"
+    )
+    if output_format in ARROW_FORMATS and not importlib.util.find_spec("pyarrow"):
+        raise click.UsageError(
+            f"{output_format} output needs pyarrow: pip install 'eq-fetch[arrow]'"
+        )
 
     if start_time:
         search_criteria.start_time = UTCDateTime(start_time)
@@ -133,115 +746,600 @@ def main(
         search_criteria.journal = journal
     if author:
         search_criteria.author = author
+    if doi:
+        search_criteria.doi = doi
+    return search_criteria, output_format
 
-    # Search
-    conn = None
-    params = []
-    query = ""
-    try:
-        conn = sqlite3.connect(_DB_PATH)
-        query = "SELECT ISC_event, Origin_Time, Lat, Lon, Depth, Mag FROM isc_events WHERE 1=1"
 
-        if search_criteria.start_time:
-            query += " AND Origin_Time >= ?"
-            params.append(str(search_criteria.start_time))
+def _run_meta(search_criteria: BibliographyCriteria, output_format: str) -> dict:
+    """Output and entry filters of a run, as kept by shard queues and the quarantine."""
+    return {
+        "output": str(search_criteria.output),
+        "format": output_format,
+        "journal": search_criteria.journal,
+        "author": search_criteria.author,
+        "doi": search_criteria.doi,
+    }
 
-        if search_criteria.end_time:
-            query += " AND Origin_Time <= ?"
-            params.append(str(search_criteria.end_time))
 
-        if search_criteria.lats and len(search_criteria.lats) == 2:
-            query += " AND Lat BETWEEN ? AND ?"
-            params.extend(sorted(search_criteria.lats))
+@contextlib.contextmanager
+def _profiling(profile: bool, metrics_json: str | None):
+    """Collect metrics for the block; print and/or dump them when it ends."""
+    profiler = metrics.enable() if profile or metrics_json else None
+    try:
+        yield
+    finally:
+        if profiler:
+            metrics.disable()
+            if profile:
+                console.print(profiler.table())
+            if metrics_json:
+                profiler.dump(Path(metrics_json))
 
-        if search_criteria.lons and len(search_criteria.lons) == 2:
-            query += " AND Lon BETWEEN ? AND ?"
-            params.extend(sorted(search_criteria.lons))
 
-        if search_criteria.deps and len(search_criteria.deps) == 2:
-            query += " AND Depth BETWEEN ? AND ?"
-            params.extend(sorted(search_criteria.deps))
+@contextlib.contextmanager
+def _exit_on_error():
+    """Report database and unexpected errors in red and exit 1."""
+    try:
+        yield
+    except sqlite3.Error as e:
+        console.print(f"[bold red]Database error: {e}[/bold red]")
+        sys.exit(1)
+    except Exception as e:
+        console.print(f"[bold red]An unexpected error occurred: {e}[/bold red]")
+        sys.exit(1)
 
-        if search_criteria.mags and len(search_criteria.mags) == 2:
-            query += " AND Mag BETWEEN ? AND ?"
-            params.extend(sorted(search_criteria.mags))
 
-        events_df = pd.read_sql_query(query, conn, params=params)
+def plan_shards(
+    queue_path: str,
+    search_criteria: BibliographyCriteria,
+    output_format: str,
+    order: str,
+    shard_size: int,
+) -> None:
+    """Record the events matching `search_criteria` as a new shard queue."""
+    from eq_fetch import shards
 
-        if events_df.empty:
-            console.print(
-                "[bold yellow]No events found matching the specified criteria in the local database. Exiting.[/bold yellow]"
+    with _exit_on_error():
+        conn = connect_index(_DB_PATH)
+        try:
+            query, params = build_event_query(
+                search_criteria, order=order, skip_unreferenced=True
+            )
+            queue = shards.WorkQueue.create(
+                queue_path,
+                conn.execute(query, params),
+                shard_size,
+                _run_meta(search_criteria, output_format),
             )
-            sys.exit(0)
+        finally:
+            conn.close()
+        try:
+            status = queue.status()
+        finally:
+            queue.close()
+    events = sum(row[1] for row in status)
+    console.print(
+        f"[bold green]Planned {len(status)} shards of up to {shard_size} events ({events} events) in {queue_path}. "
+        f"Start workers with: eq-fetch shard work {queue_path}[/bold green]"
+    )
+
 
+def work_shards(
+    queue_path: str,
+    lease: float,
+    time_limit: float | None,
+    workers: int,
+    rate: float | None,
+    retries: int,
+    cache_path: str,
+    no_cache: bool,
+    cache_ttl: float,
+    cache_size: int,
+    cache_only: bool,
+    refresh: bool,
+    quarantine_dir: str,
+) -> None:
+    """Claim and fetch shards of the queue at `queue_path` until none are left."""
+    from eq_fetch import shards, transport
+    from eq_fetch.fetcher import TokenBucket
+    from eq_fetch.quarantine import Quarantine
+
+    if cache_only and (refresh or no_cache):
+        raise click.UsageError(
+            "--cache-only cannot be combined with --refresh or --no-cache."
+        )
+    queue = None
+    cache = None
+    with _exit_on_error():
+        try:
+            queue = shards.WorkQueue(queue_path)
+            meta = queue.meta
+            quarantine = Quarantine(quarantine_dir, meta)
+            limiter = TokenBucket(rate) if rate else None
+            transport.configure(
+                retries=retries, pool_size=max(workers, 16), concurrency=workers
+            )
+            cache = _open_cache(
+                cache_path,
+                no_cache,
+                bool(meta["journal"] or meta["author"] or meta["doi"]),
+                cache_ttl,
+                cache_size,
+            )
+            fetch = _fetcher(
+                limiter,
+                cache,
+                refresh,
+                cache_only,
+                meta["journal"],
+                meta["author"],
+                meta["doi"],
+                quarantine=quarantine,
+            )
+            deadline = time.monotonic() + time_limit * 60 if time_limit else None
+            done, incomplete = _work_shards(queue, fetch, workers, lease, deadline)
+        finally:
+            if cache:
+                cache.close()
+            if queue:
+                queue.close()
+    console.print(
+        f"[bold green]Worker {shards.default_owner()} finished {done} shards.[/bold green]"
+    )
+    _report_quarantine(quarantine)
+    if incomplete:
         console.print(
-            f"[bold green]Found {len(events_df)} events matching the criteria in local DB. Proceeding to fetch bibliographies...[/bold green]"
+            f"[bold yellow]Shards {', '.join(map(str, incomplete))} had failed events and are pending again; "
+            "start a worker later to retry them.[/bold yellow]"
         )
+        sys.exit(1)
 
-        fe = flinnengdahl.FlinnEngdahl()
-        all_bibliographies = [
-            [
-                "ISC_event",
-                "Origin_Time",
-                "Mag",
-                "Lat",
-                "Lon",
-                "Dep",
-                "Region",
-                "DOI_link",
-                "Bibliography_Entry",
-            ]
-        ]
-        for _, event in track(
-            events_df.iterrows(),
-            total=len(events_df),
-            description="Fetching bibliographies...",
-            console=console,
-        ):
-            event_id = str(int(event["ISC_event"]))
-            origin_time = UTCDateTime(event["Origin_Time"]).isoformat()
-            lat = str(event["Lat"])
-            lon = str(event["Lon"])
-            dep = str(event["Depth"])
-            max_mag = str(event["Mag"])
-            region = fe.name(float(lat), float(lon))
-
-            bibliographies = fetch_bibliographies(event_id)
-            for bib_entry in bibliographies:
-                doi_link = ""
-                with contextlib.suppress(IndexError):
-                    doi_link = "http://dx.doi.org/" + bib_entry.split("DOI:")[1].strip()
-                all_bibliographies.append(
-                    [
-                        event_id,
-                        origin_time,
-                        max_mag,
-                        lat,
-                        lon,
-                        dep,
-                        region,
-                        doi_link,
-                        bib_entry,
-                    ]
-                )
 
-        with open(search_criteria.output, "w", newline="", encoding="utf-8") as f:
-            writer = csv.writer(f)
-            writer.writerows(all_bibliographies)
+def merge_shards(queue_path: str, output: str | None) -> None:
+    """Concatenate the finished shards into `output`, or the planned output."""
+    from eq_fetch import shards
 
-        console.print(
-            f"[bold green]Successfully extracted bibliographies to {search_criteria.output}[/bold green]"
+    with _exit_on_error():
+        queue = shards.WorkQueue(queue_path)
+        try:
+            meta = queue.meta
+            output_path = Path(output or meta["output"])
+            schema = None if meta["format"] == "csv" else _arrow_schema()
+            count = shards.merge(queue, output_path, schema)
+        finally:
+            queue.close()
+    console.print(f"[bold green]Merged {count} shards into {output_path}[/bold green]")
+
+
+def _apply(options: list[Callable]) -> Callable:
+    """Return a decorator applying `options` in order, as stacked decorators would."""
+
+    def decorate(command: Callable) -> Callable:
+        for option in reversed(options):
+            command = option(command)
+        return command
+
+    return decorate
+
+
+# Options shared by biblio-fetch and the eq-fetch shard commands.
+_search_options = _apply(
+    [
+        click.option(
+            "--output",
+            "-o",
+            type=click.Path(dir_okay=False, writable=True),
+            default="bibliographies.csv",
+            show_default=True,
+            help="Path to the output file.",
+        ),
+        click.option(
+            "--format",
+            "output_format",
+            type=click.Choice(["csv", *ARROW_FORMATS]),
+            help="Output format; inferred from the --output suffix (.parquet, .feather) when omitted.",
+        ),
+        click.option(
+            "--start-time",
+            type=click.DateTime(formats=["%Y%m%d %H:%M:%S", "%Y%m%d"]),
+            help="Start origin time (YYYYMMDD hh:mm:ss or YYYYMMDD).",
+        ),
+        click.option(
+            "--end-time",
+            type=click.DateTime(formats=["%Y%m%d %H:%M:%S", "%Y%m%d"]),
+            help="End origin time (YYYYMMDD hh:mm:ss or YYYYMMDD).",
+        ),
+        click.option(
+            "--lats",
+            type=RangeParams(),
+            help="Central latitude or latitude range. Provide 1 or 2 values separated by spaces.",
+        ),
+        click.option(
+            "--lons",
+            type=RangeParams(),
+            help="Central longitude or longitude range as WEST EAST. Provide 1 or 2 values separated by spaces; '170 -170' crosses the antimeridian.",
+        ),
+        click.option(
+            "--deps",
+            type=RangeParams(),
+            help="Central depth or depth range in km. Provide 1 or 2 values separated by spaces.",
+        ),
+        click.option(
+            "--mags",
+            type=RangeParams(),
+            help="Central magnitude or magnitude range. Provide 1 or 2 values separated by spaces.",
+        ),
+        click.option(
+            "--journal",
+            type=str,
+            help="Keep only entries containing this journal name (phrase match, case-insensitive).",
+        ),
+        click.option(
+            "--author",
+            type=str,
+            help="Keep only entries whose author list contains this name (phrase match, case-insensitive).",
+        ),
+        click.option(
+            "--doi",
+            type=str,
+            help="Keep only entries whose DOI starts with this prefix.",
+        ),
+        click.option(
+            "--order",
+            type=click.Choice(ORDERS),
+            default="refs",
+            show_default=True,
+            help="Fetch priority: most references, largest magnitude or newest first.",
+        ),
+    ]
+)
+_fetch_options = _apply(
+    [
+        click.option(
+            "--time-limit",
+            type=click.FloatRange(min=0, min_open=True),
+            help="Stop after this many minutes; continue later with --resume.",
+        ),
+        click.option(
+            "--workers",
+            type=click.IntRange(min=1),
+            default=4,
+            show_default=True,
+            help="Most bibliography requests in flight at once; the adaptive limiter starts at one and grows toward this while the server keeps up.",
+        ),
+        click.option(
+            "--rate",
+            type=click.FloatRange(min=0, min_open=True),
+            help="Ceiling on bibliography requests per second across all workers; by default the adaptive limiter alone sets the pace.",
+        ),
+        click.option(
+            "--retries",
+            type=click.IntRange(min=0),
+            default=3,
+            show_default=True,
+            help="Retries with exponential backoff for failed or 5xx requests.",
+        ),
+        click.option(
+            "--cache",
+            "cache_path",
+            type=click.Path(dir_okay=False, writable=True),
+            default=str(_CACHE_PATH),
+            show_default=True,
+            help="Path to the on-disk bibliography cache.",
+        ),
+        click.option(
+            "--no-cache", is_flag=True, help="Do not read or write the cache."
+        ),
+        click.option(
+            "--cache-ttl",
+            type=click.FloatRange(min=0),
+            default=30.0,
+            show_default=True,
+            help="Days before a cached bibliography is fetched again (0 never expires).",
+        ),
+        click.option(
+            "--cache-size",
+            type=click.IntRange(min=1),
+            default=512,
+            show_default=True,
+            help="Maximum cache size in MB; least recently used events are evicted.",
+        ),
+        click.option(
+            "--cache-only",
+            is_flag=True,
+            help="Only use cached bibliographies; no network.",
+        ),
+        click.option(
+            "--refresh",
+            is_flag=True,
+            help="Ignore cached bibliographies and fetch again.",
+        ),
+        click.option(
+            "--quarantine",
+            "quarantine_dir",
+            type=click.Path(file_okay=False, writable=True),
+            default=str(_QUARANTINE_DIR),
+            show_default=True,
+            help="Directory where pages the parser cannot read are saved raw, with their event id and the reason.",
+        ),
+    ]
+)
+_profile_options = _apply(
+    [
+        click.option(
+            "--profile",
+            is_flag=True,
+            help="Print per-stage timings, request latencies and cache counters at exit.",
+        ),
+        click.option(
+            "--metrics-json",
+            type=click.Path(dir_okay=False, writable=True),
+            help="Also write the profile metrics to this JSON file.",
+        ),
+    ]
+)
+
+
+@click.command(context_settings={"help_option_names": ["-h", "--help"]})
+@_search_options
+@click.option(
+    "--bulk/--no-bulk",
+    "bulk_pages",
+    default=True,
+    show_default=True,
+    help="Fetch dense time windows as bibsearch.pl pages of up to 500 events; the rest go per event.",
+)
+@_fetch_options
+@click.option(
+    "--dry-run",
+    "--explain",
+    "dry_run",
+    is_flag=True,
+    help="Report matched events, expected rows, cache coverage, request count, run time and the SQL plan, then exit without fetching.",
+)
+@_profile_options
+@click.option(
+    "--resume",
+    is_flag=True,
+    help="Skip events finished by an interrupted run with the same criteria and append to its output.",
+)
+@click.option(
+    "--reprocess-quarantine",
+    is_flag=True,
+    help="Parse the quarantined pages again without refetching and append the recovered rows to the outputs of the runs that saved them.",
+)
+def main(
+    output: str,
+    output_format: str | None,
+    start_time: UTCDateTime,
+    end_time: UTCDateTime,
+    lats: list[float],
+    lons: list[float],
+    deps: list[float],
+    mags: list[float],
+    author: str,
+    journal: str,
+    doi: str,
+    order: str,
+    bulk_pages: bool,
+    time_limit: float | None,
+    workers: int,
+    rate: float | None,
+    retries: int,
+    cache_path: str,
+    no_cache: bool,
+    cache_ttl: float,
+    cache_size: int,
+    cache_only: bool,
+    refresh: bool,
+    dry_run: bool,
+    profile: bool,
+    metrics_json: str | None,
+    resume: bool,
+    quarantine_dir: str,
+    reprocess_quarantine: bool,
+):
+    """Extracts bibliographies for ISC seismic events based on user-specified filters."""
+    import pandas as pd
+
+    from eq_fetch import transport
+    from eq_fetch.cache import BibliographyCache
+    from eq_fetch.fetcher import TokenBucket
+    from eq_fetch.journal import RunJournal, criteria_key
+    from eq_fetch.quarantine import Quarantine
+
+    if cache_only and (refresh or no_cache):
+        raise click.UsageError(
+            "--cache-only cannot be combined with --refresh or --no-cache."
         )
+    search_criteria, output_format = _criteria(
+        output,
+        output_format,
+        start_time,
+        end_time,
+        lats,
+        lons,
+        deps,
+        mags,
+        journal,
+        author,
+        doi,
+    )
+    filtering = bool(journal or author or doi)
 
-    except sqlite3.Error as e:
-        console.print(f"[bold red]Database error: {e}[/bold red]")
-        sys.exit(1)
-    except Exception as e:
-        console.print(f"[bold red]An unexpected error occurred in main: {e}[/bold red]")
-        sys.exit(1)
-    finally:
-        if conn:
-            conn.close()
+    with _profiling(profile, metrics_json), _exit_on_error():
+        conn = None
+        cache = None
+        run_journal = None
+        try:
+            if reprocess_quarantine:
+                conn = connect_index(_DB_PATH)
+                cache = _open_cache(cache_path, no_cache, True, cache_ttl, cache_size)
+                _reprocess_quarantine(Quarantine(quarantine_dir), conn, cache)
+                return
+
+            # Search
+            conn = connect_index(_DB_PATH)
+            query, params = build_event_query(
+                search_criteria, order=order, skip_unreferenced=True
+            )
+            with metrics.timer("db_query"):
+                events_df = pd.read_sql_query(query, conn, params=params)
+
+            if dry_run:
+                cached = set()
+                if not (no_cache or refresh) and Path(cache_path).exists():
+                    cache = BibliographyCache(
+                        Path(cache_path), ttl_days=cache_ttl, max_bytes=None
+                    )
+                    cached = cache.cached(events_df["ISC_event"].astype(str).tolist())
+                windows = []
+                if bulk_pages and not cache_only:
+                    windows, _ = _bulk_plan(conn, events_df, cached)
+                planned = 0 if cache_only else _requests(events_df, cached, windows)
+                _explain(
+                    conn,
+                    query,
+                    params,
+                    events_df,
+                    len(cached),
+                    windows,
+                    planned,
+                    rate,
+                    workers,
+                )
+                return
+
+            if events_df.empty:
+                console.print(
+                    "[bold yellow]No events found matching the specified criteria in the local database. Exiting.[/bold yellow]"
+                )
+                sys.exit(0)
+
+            console.print(
+                f"[bold green]Found {len(events_df)} events matching the criteria in local DB. Proceeding to fetch bibliographies...[/bold green]"
+            )
+
+            journal_key = criteria_key(search_criteria)
+            run_journal = RunJournal(journal_key)
+            resuming = resume and search_criteria.output.exists()
+            if resuming:
+                completed = run_journal.completed()
+                events_df = events_df[~events_df["ISC_event"].isin(completed)]
+                console.print(
+                    f"[bold green]Resuming run {journal_key}: {len(completed)} events already done, {len(events_df)} remaining.[/bold green]"
+                )
+            else:
+                run_journal.reset()
+
+            cache = _open_cache(cache_path, no_cache, filtering, cache_ttl, cache_size)
+            cached = set()
+            if cache and not refresh:
+                cached = cache.cached(events_df["ISC_event"].astype(str).tolist())
+            windows = []
+            if bulk_pages and not cache_only:
+                windows, _ = _bulk_plan(conn, events_df, cached)
+            planned = 0 if cache_only else _requests(events_df, cached, windows)
+            pace = (
+                f"at {rate:g} requests/s this takes at least {timedelta(seconds=round(planned / rate))}"
+                if rate
+                else f"the adaptive limiter paces them, up to {workers} in flight"
+            )
+            pace += f" (estimated ~{_estimate(planned, rate, workers)} at {_ASSUMED_LATENCY:g} s per request)"
+            console.print(
+                f"[bold green]Planned {planned} requests for about {int(_weights(events_df).sum())} references; "
+                f"{pace}.[/bold green]"
+            )
+
+            limiter = TokenBucket(rate) if rate else None
+            transport.configure(
+                retries=retries, pool_size=max(workers, 16), concurrency=workers
+            )
+            quarantine = Quarantine(
+                quarantine_dir, _run_meta(search_criteria, output_format)
+            )
+            prefetched: dict[str, list[str]] = {}
+            fetch = _fetcher(
+                limiter,
+                cache,
+                refresh,
+                cache_only,
+                search_criteria.journal,
+                search_criteria.author,
+                search_criteria.doi,
+                prefetched,
+                quarantine,
+            )
+            deadline = time.monotonic() + time_limit * 60 if time_limit else None
+
+            def keep_going() -> bool:
+                return deadline is None or time.monotonic() < deadline
+
+            failed: list[str] = []
+            with _open_writer(
+                search_criteria.output,
+                output_format,
+                append=resuming,
+                on_flush=run_journal.mark_done,
+            ) as writer:
+                finished = True
+                if windows:
+                    console.print(
+                        f"[bold green]Fetching {len(windows)} bulk pages covering {sum(len(w.events) for w in windows)} events; the rest go per event.[/bold green]"
+                    )
+                    finished, events_df = _write_windows(
+                        windows,
+                        events_df,
+                        fetch,
+                        prefetched,
+                        limiter,
+                        cache,
+                        writer,
+                        workers,
+                        keep_going,
+                        failed,
+                    )
+                if finished:
+                    finished = _write_events(
+                        events_df,
+                        fetch,
+                        writer,
+                        workers,
+                        keep_going,
+                        failed,
+                        description=(
+                            "Fetching events missing from bulk pages..."
+                            if windows
+                            else "Fetching bibliographies..."
+                        ),
+                    )
+            _report_quarantine(quarantine)
+            if failed:
+                console.print(
+                    f"[bold yellow]{len(failed)} events could not be fetched and are missing from {search_criteria.output} "
+                    f"(first: {failed[0]}). Run again with --resume to retry them.[/bold yellow]"
+                )
+
+            if not finished:
+                console.print(
+                    f"[bold yellow]Time limit reached; partial results in {search_criteria.output}. "
+                    "Run again with --resume to continue.[/bold yellow]"
+                )
+                return
+            if failed:
+                sys.exit(1)
+            console.print(
+                f"[bold green]Successfully extracted bibliographies to {search_criteria.output}[/bold green]"
+            )
+
+        finally:
+            if conn:
+                conn.close()
+            if cache:
+                cache.close()
+            if run_journal:
+                run_journal.close()
 
 
 if __name__ == "__main__":
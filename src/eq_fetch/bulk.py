@@ -0,0 +1,127 @@
+"""Bulk bibliography pages from the ISC bibsearch.pl endpoint.
+
+One bibsearch.pl page lists the references of every referenced event in a
+time window, up to 500 events, so a dense run can replace hundreds of
+FormatBibprint requests with a single page. `plan_windows` picks those
+windows from the local event index, and `parse_page` maps a page back to
+ISC event ids.
+"""
+
+import bisect
+import math
+import sqlite3
+from datetime import datetime, timezone
+from typing import NamedTuple
+
+from eq_fetch.extract import body_strings
+
+BULK_CAP = 500
+
+# A page is used only when it replaces at least this many requests...
+_MIN_EVENTS = 2
+# ...and lists at most this many events per event the run needs.
+_MAX_WASTE = 20
+
+_OVERFLOW = "limited to 500 seismic events"
+
+
+class Window(NamedTuple):
+    start: int  # epoch seconds, inclusive
+    end: int  # epoch seconds, inclusive
+    events: list[str]  # ISC event ids the run needs from this page
+    size: int  # referenced events the page is expected to list
+
+
+def referenced_times(conn: sqlite3.Connection, start: float, end: float) -> list:
+    """Sorted origin times of indexed events that may have references.
+
+    Events with an unknown reference count are included, so page sizes are
+    overestimated rather than under.
+    """
+    return [
+        origin
+        for (origin,) in conn.execute(
+            "SELECT Origin_Time FROM isc_events"
+            " WHERE Origin_Time >= ? AND Origin_Time <= ? AND (N IS NULL OR N > 0)"
+            " ORDER BY Origin_Time",
+            (math.floor(start), math.ceil(end)),
+        )
+    ]
+
+
+def plan_windows(
+    needed: list[tuple[str, float]], times: list, cap: int = BULK_CAP
+) -> tuple[list[Window], list[str]]:
+    """Split `needed` (event id, origin time) into bulk windows and stragglers.
+
+    Windows are grown greedily in time order while the page would list at
+    most `cap` events of `times`, which gives the fewest windows; a window
+    too sparse in needed events is dropped and its first event left to the
+    per-event endpoint.
+    """
+    needed = sorted(needed, key=lambda event: event[1])
+
+    def size(start: int, end: int) -> int:
+        return bisect.bisect_right(times, end) - bisect.bisect_left(times, start)
+
+    windows: list[Window] = []
+    stragglers: list[str] = []
+    i, j = 0, 0
+    while i < len(needed):
+        start = math.floor(needed[i][1])
+        j = max(j, i)
+        while j + 1 < len(needed) and size(start, math.ceil(needed[j + 1][1])) <= cap:
+            j += 1
+        end = math.ceil(needed[j][1])
+        count = j - i + 1
+        listed = size(start, end)
+        if count >= _MIN_EVENTS and listed <= min(cap, count * _MAX_WASTE):
+            windows.append(
+                Window(start, end, [evid for evid, _ in needed[i : j + 1]], listed)
+            )
+            i = j + 1
+        else:
+            stragglers.append(needed[i][0])
+            i += 1
+    return windows, stragglers
+
+
+def window_url(window: Window) -> str:
+    """Return the global bibsearch.pl query for `window`."""
+    # transport pulls in requests; biblio imports this module at startup.
+    from eq_fetch import transport
+
+    start = datetime.fromtimestamp(window.start, timezone.utc)
+    end = datetime.fromtimestamp(window.end, timezone.utc)
+    return (
+        transport.isc_url("cgi-bin/bibsearch.pl")
+        + "?searchshape=GLOBAL"
+        + f"&start_year={start.year}&start_month={start.month}&start_day={start.day}"
+        + f"&stime={start:%H}%3A{start:%M}%3A{start:%S}"
+        + f"&end_year={end.year}&end_month={end.month}&end_day={end.day}"
+        + f"&etime={end:%H}%3A{end:%M}%3A{end:%S}"
+        + f"&minyear=1900&maxyear={datetime.now(timezone.utc).year}"
+        + "&sortby=day&publisher=&authors="
+    )
+
+
+def parse_page(html: str) -> dict[str, list[str]] | None:
+    """Return each listed event's entries by ISC event id.
+
+    None means the page hit the 500-event cap and is incomplete.
+    """
+    lines = body_strings(html)
+    if any(_OVERFLOW in line for line in lines[:40]):
+        return None
+    header_pos = [n for n, line in enumerate(lines) if line[:4] == " ISC"]
+    header_pos.append(len(lines))
+    events = {}
+    for n, pos in enumerate(header_pos[:-1]):
+        evid = lines[pos + 1].strip()
+        event_info = lines[pos + 2].split()
+        # Agency, date, time, lat, lon, depth, [type (agency) mag,] N[, code]
+        num_articles = int(event_info[6] if len(event_info) < 10 else event_info[9])
+        text = "".join(lines[pos + 3 : header_pos[n + 1]])
+        entries = [line.strip() for line in text.split("\n") if line.strip()]
+        events[evid] = entries[:num_articles]
+    return events
@@ -0,0 +1,290 @@
+"""Persistent local store of ISC event bibliographies.
+
+Entries are normalized into events, publications and the links between them,
+with an FTS5 index over publication text so journal, author and DOI
+predicates can be answered without going back to the ISC.
+"""
+
+import json
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from eq_fetch.index import _run_script
+
+_CACHE_PATH = Path("data/bibliography_cache.db")
+_DAY = 86400.0
+_STORE_VERSION = 1
+
+# "Authors (1999). Title, Journal, ..." — the author list ends at the year.
+_AUTHORS = re.compile(r"^(.*?)\s*\(\d{4}[a-z]?\)")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    evid INTEGER PRIMARY KEY,
+    size INTEGER NOT NULL,
+    fetched_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_events_accessed ON events (accessed_at);
+CREATE TABLE IF NOT EXISTS publications (
+    pub_id INTEGER PRIMARY KEY,
+    entry TEXT NOT NULL UNIQUE,
+    authors TEXT NOT NULL,
+    doi TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_publications_doi ON publications (doi);
+CREATE TABLE IF NOT EXISTS event_publications (
+    evid INTEGER NOT NULL REFERENCES events (evid),
+    position INTEGER NOT NULL,
+    pub_id INTEGER NOT NULL REFERENCES publications (pub_id),
+    PRIMARY KEY (evid, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_event_publications_pub
+    ON event_publications (pub_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS publications_fts USING fts5 (
+    authors, entry,
+    content='publications', content_rowid='pub_id',
+    tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS publications_fts_insert
+AFTER INSERT ON publications BEGIN
+    INSERT INTO publications_fts (rowid, authors, entry)
+    VALUES (new.pub_id, new.authors, new.entry);
+END;
+CREATE TRIGGER IF NOT EXISTS publications_fts_delete
+AFTER DELETE ON publications BEGIN
+    INSERT INTO publications_fts (publications_fts, rowid, authors, entry)
+    VALUES ('delete', old.pub_id, old.authors, old.entry);
+END;
+"""
+
+
+def _authors(entry: str) -> str:
+    match = _AUTHORS.match(entry)
+    return match.group(1) if match else ""
+
+
+def _doi(entry: str) -> str | None:
+    _, sep, doi = entry.partition("DOI:")
+    return doi.strip() if sep and doi.strip() else None
+
+
+def _phrase(column: str, text: str) -> str:
+    return f'{column} : "{text.replace(chr(34), chr(34) * 2)}"'
+
+
+class BibliographyCache:
+    """SQLite store of parsed bibliography entries keyed by ISC event id.
+
+    Entries older than `ttl_days` are treated as misses. Once the stored
+    entries exceed `max_bytes`, the least recently used events are evicted
+    along with any publications no other event cites.
+    """
+
+    def __init__(
+        self,
+        path: Path | str = _CACHE_PATH,
+        ttl_days: float | None = 30.0,
+        max_bytes: int | None = 512 * 1024 * 1024,
+    ):
+        self.path = Path(path)
+        self.ttl = ttl_days * _DAY if ttl_days else None
+        self.max_bytes = max_bytes
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            self.path, check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._size = 0
+        self._dirty = False
+        self._upgrade()
+        self._size = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM events"
+        ).fetchone()[0]
+
+    def _upgrade(self) -> None:
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] >= _STORE_VERSION:
+            return
+        legacy = self._conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'bibliographies'"
+        ).fetchone()
+        self._conn.execute("BEGIN IMMEDIATE")
+        _run_script(self._conn, _SCHEMA)
+        if legacy:
+            rows = self._conn.execute(
+                "SELECT evid, entries, fetched_at, accessed_at FROM bibliographies"
+            ).fetchall()
+            for evid, entries, fetched_at, accessed_at in rows:
+                self._store(evid, json.loads(entries), fetched_at, accessed_at)
+            self._conn.execute("DROP TABLE bibliographies")
+        self._conn.execute(f"PRAGMA user_version = {_STORE_VERSION}")
+        self._conn.execute("COMMIT")
+
+    def _fresh_after(self) -> float:
+        return time.time() - self.ttl if self.ttl is not None else float("-inf")
+
+    def get(self, event_id: str) -> list[str] | None:
+        """Return cached entries for `event_id`, or None on a miss."""
+        evid = int(event_id)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT fetched_at FROM events WHERE evid = ?", (evid,)
+            ).fetchone()
+            if row is None or row[0] < self._fresh_after():
+                return None
+            self._conn.execute(
+                "UPDATE events SET accessed_at = ? WHERE evid = ?",
+                (time.time(), evid),
+            )
+            entries = self._conn.execute(
+                "SELECT p.entry FROM event_publications l"
+                " JOIN publications p ON p.pub_id = l.pub_id"
+                " WHERE l.evid = ? ORDER BY l.position",
+                (evid,),
+            ).fetchall()
+        return [entry for (entry,) in entries]
+
+    def cached(self, event_ids: list[str]) -> set[str]:
+        """Return the subset of `event_ids` with unexpired entries stored."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT evid FROM events WHERE fetched_at >= ?",
+                (self._fresh_after(),),
+            ).fetchall()
+        return {str(evid) for (evid,) in rows} & set(map(str, event_ids))
+
+    def put(self, event_id: str, entries: list[str]) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._store(int(event_id), entries, now, now)
+                self._evict()
+                self._conn.execute("COMMIT")
+                self._dirty = True
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def matching(
+        self,
+        event_id: str,
+        journal: str = "",
+        author: str = "",
+        doi: str = "",
+    ) -> list[str]:
+        """Return the stored entries of `event_id` that satisfy every predicate.
+
+        `journal` and `author` are matched as phrases, case- and
+        accent-insensitively, against the whole entry and its author list
+        respectively; `doi` is a case-insensitive DOI prefix.
+        """
+        terms = []
+        if journal:
+            terms.append(_phrase("entry", journal))
+        if author:
+            terms.append(_phrase("authors", author))
+        sql = (
+            "SELECT p.entry FROM event_publications l"
+            " JOIN events e ON e.evid = l.evid"
+            " JOIN publications p ON p.pub_id = l.pub_id"
+            " WHERE l.evid = ? AND e.fetched_at >= ?"
+        )
+        params: list = [int(event_id), self._fresh_after()]
+        if terms:
+            sql += (
+                " AND EXISTS (SELECT 1 FROM publications_fts"
+                " WHERE publications_fts MATCH ? AND rowid = l.pub_id)"
+            )
+            params.append(" AND ".join(terms))
+        if doi:
+            sql += " AND instr(lower(p.doi), lower(?)) = 1"
+            params.append(doi)
+        sql += " ORDER BY l.position"
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [entry for (entry,) in rows]
+
+    def _store(
+        self, evid: int, entries: list[str], fetched_at: float, accessed_at: float
+    ) -> None:
+        previous = [
+            pub_id
+            for (pub_id,) in self._conn.execute(
+                "SELECT pub_id FROM event_publications WHERE evid = ?", (evid,)
+            )
+        ]
+        self._conn.execute("DELETE FROM event_publications WHERE evid = ?", (evid,))
+        links = []
+        for position, entry in enumerate(entries):
+            self._conn.execute(
+                "INSERT OR IGNORE INTO publications (entry, authors, doi)"
+                " VALUES (?, ?, ?)",
+                (entry, _authors(entry), _doi(entry)),
+            )
+            (pub_id,) = self._conn.execute(
+                "SELECT pub_id FROM publications WHERE entry = ?", (entry,)
+            ).fetchone()
+            links.append((evid, position, pub_id))
+        self._conn.executemany(
+            "INSERT INTO event_publications (evid, position, pub_id) VALUES (?, ?, ?)",
+            links,
+        )
+        size = sum(len(entry.encode("utf-8")) for entry in entries)
+        old = self._conn.execute(
+            "SELECT size FROM events WHERE evid = ?", (evid,)
+        ).fetchone()
+        self._conn.execute(
+            "INSERT INTO events (evid, size, fetched_at, accessed_at)"
+            " VALUES (?, ?, ?, ?)"
+            " ON CONFLICT (evid) DO UPDATE SET size = excluded.size,"
+            " fetched_at = excluded.fetched_at, accessed_at = excluded.accessed_at",
+            (evid, size, fetched_at, accessed_at),
+        )
+        self._size += size - (old[0] if old else 0)
+        self._drop_orphans(previous)
+
+    def _drop_orphans(self, pub_ids: list[int]) -> None:
+        self._conn.executemany(
+            "DELETE FROM publications WHERE pub_id = ? AND NOT EXISTS"
+            " (SELECT 1 FROM event_publications WHERE pub_id = ?)",
+            [(pub_id, pub_id) for pub_id in set(pub_ids)],
+        )
+
+    def _evict(self) -> None:
+        if self.max_bytes is None or self._size <= self.max_bytes:
+            return
+        rows = self._conn.execute("SELECT evid, size FROM events ORDER BY accessed_at")
+        evicted = []
+        for evid, size in rows:
+            if self._size <= self.max_bytes:
+                break
+            evicted.append(evid)
+            self._size -= size
+        rows.close()
+        orphans = []
+        for evid in evicted:
+            orphans.extend(
+                pub_id
+                for (pub_id,) in self._conn.execute(
+                    "SELECT pub_id FROM event_publications WHERE evid = ?", (evid,)
+                )
+            )
+            self._conn.execute("DELETE FROM event_publications WHERE evid = ?", (evid,))
+            self._conn.execute("DELETE FROM events WHERE evid = ?", (evid,))
+        self._drop_orphans(orphans)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._dirty:
+                # Per-event commits leave many small FTS segments; merging
+                # them keeps the next run's local predicate lookups fast.
+                self._conn.execute(
+                    "INSERT INTO publications_fts (publications_fts) VALUES ('optimize')"
+                )
+            self._conn.close()
@@ -0,0 +1,172 @@
+"""Command line entry point for eq-fetch."""
+
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+import rich_click as click
+from rich.console import Console
+
+from eq_fetch import biblio
+from eq_fetch import index as event_index
+
+console = Console()
+
+
+@click.group(context_settings={"help_option_names": ["-h", "--help"]})
+def main():
+    """Tools for fetching and indexing earthquake catalog data."""
+
+
+@main.group()
+def index():
+    """Manage the local ISC event index."""
+
+
+@index.command()
+@click.option(
+    "--db",
+    type=click.Path(dir_okay=False, exists=True),
+    default=str(event_index._DB_PATH),
+    show_default=True,
+    help="Path to the event index database.",
+)
+def migrate(db: str):
+    """Upgrade the event index to the current typed, indexed schema."""
+    try:
+        count = event_index.migrate(db)
+    except sqlite3.Error as e:
+        console.print(f"[bold red]Database error: {e}[/bold red]")
+        sys.exit(1)
+    if count < 0:
+        console.print(f"[bold green]{db} is already up to date.[/bold green]")
+    else:
+        console.print(
+            f"[bold green]Migrated {count} events in {db} to schema version {event_index.SCHEMA_VERSION}.[/bold green]"
+        )
+
+
+@index.command()
+@click.argument(
+    "files", nargs=-1, required=True, type=click.Path(dir_okay=False, exists=True)
+)
+@click.option(
+    "--db",
+    type=click.Path(dir_okay=False),
+    default=str(event_index._DB_PATH),
+    show_default=True,
+    help="Path to the event index database; created if missing.",
+)
+@click.option(
+    "--full",
+    is_flag=True,
+    help="Upsert every row instead of only those newer than the index.",
+)
+@click.option(
+    "--batch-size",
+    type=click.IntRange(min=1),
+    default=50000,
+    show_default=True,
+    help="Rows per transaction.",
+)
+def ingest(files: tuple[str, ...], db: str, full: bool, batch_size: int):
+    """Bulk-load ISC catalogue CSV or ISF FILES into the event index."""
+    started = time.perf_counter()
+    try:
+        read, written = event_index.ingest(
+            [Path(f) for f in files], Path(db), full=full, batch_size=batch_size
+        )
+    except (sqlite3.Error, ValueError) as e:
+        console.print(f"[bold red]Ingest failed: {e}[/bold red]")
+        sys.exit(1)
+    console.print(
+        f"[bold green]Read {read} rows, upserted {written} into {db} in {time.perf_counter() - started:.1f}s.[/bold green]"
+    )
+
+
+@main.group()
+def shard():
+    """Split a biblio-fetch run into shards fetched by several workers."""
+
+
+@shard.command()
+@click.argument("queue", type=click.Path(dir_okay=False, writable=True))
+@click.option(
+    "--shard-size",
+    type=click.IntRange(min=1),
+    default=1000,
+    show_default=True,
+    help="Events per shard.",
+)
+@biblio._search_options
+def plan(queue: str, shard_size: int, order: str, **search):
+    """Record the events matching the search, in fetch order, as shards in the new work queue QUEUE."""
+    search_criteria, output_format = biblio._criteria(**search)
+    biblio.plan_shards(queue, search_criteria, output_format, order, shard_size)
+
+
+@shard.command()
+@click.argument("queue", type=click.Path(dir_okay=False, exists=True))
+@click.option(
+    "--lease",
+    type=click.FloatRange(min=1),
+    default=300.0,
+    show_default=True,
+    help="Seconds a claimed shard stays reserved without a heartbeat.",
+)
+@biblio._fetch_options
+@biblio._profile_options
+def work(queue: str, lease: float, profile: bool, metrics_json: str | None, **fetch):
+    """Claim and fetch shards from QUEUE until none are left; search criteria come from the queue."""
+    with biblio._profiling(profile, metrics_json):
+        biblio.work_shards(queue, lease, **fetch)
+
+
+@shard.command()
+@click.argument("queue", type=click.Path(dir_okay=False, exists=True))
+@click.option(
+    "--output",
+    "-o",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Merged file; defaults to the output given when the queue was planned.",
+)
+def merge(queue: str, output: str | None):
+    """Concatenate the finished shards of QUEUE into one output file."""
+    biblio.merge_shards(queue, output)
+
+
+@shard.command()
+@click.argument("queue", type=click.Path(dir_okay=False, exists=True))
+def status(queue: str):
+    """Show the state, owner and lease of every shard in QUEUE."""
+    from rich.table import Table
+
+    from eq_fetch import shards
+
+    work = shards.WorkQueue(queue)
+    try:
+        rows = work.status()
+    except sqlite3.Error as e:
+        console.print(f"[bold red]Database error: {e}[/bold red]")
+        sys.exit(1)
+    finally:
+        work.close()
+    now = time.time()
+    table = Table(title=str(queue))
+    for column in ["Shard", "Events", "State", "Owner", "Lease left", "Attempts"]:
+        table.add_column(column, justify="right")
+    for shard_id, events, state, owner, lease_expires, attempts in rows:
+        left = ""
+        if state == "leased":
+            left = f"{lease_expires - now:.0f}s" if lease_expires > now else "expired"
+        table.add_row(
+            str(shard_id), str(events), state, owner or "", left, str(attempts)
+        )
+    console.print(table)
+    done = sum(state == "done" for _, _, state, *_ in rows)
+    console.print(f"[bold green]{done} of {len(rows)} shards done.[/bold green]")
+
+
+if __name__ == "__main__":
+    main()
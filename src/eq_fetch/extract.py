@@ -0,0 +1,47 @@
+"""Lightweight text extraction for ISC bibliography pages.
+
+The ISC pages are plain preformatted text wrapped in a little markup, so a
+single regex pass over the tags yields the same text as a full
+BeautifulSoup(..., "html.parser") tree at a fraction of the cost.
+"""
+
+import re
+from html import unescape
+from typing import Iterator
+
+_MARKUP = re.compile(
+    r"<!--.*?-->"
+    r"|<!\[CDATA\[(?P<cdata>.*?)\]\]>"
+    r"|<(?P<raw>script|style)\b[^>]*>.*?</(?P=raw)\s*>"
+    r"|</?[A-Za-z](?:[^>\"']|\"[^\"]*\"|'[^']*')*>"
+    r"|<[!?][^>]*>",
+    re.DOTALL | re.IGNORECASE,
+)
+_BODY_START = re.compile(r"<body\b(?:[^>\"']|\"[^\"]*\"|'[^']*')*>", re.IGNORECASE)
+_BODY_END = re.compile(r"</body\s*>", re.IGNORECASE)
+
+
+def _strings(html: str) -> Iterator[str]:
+    pos = 0
+    for match in _MARKUP.finditer(html):
+        if match.start() > pos:
+            yield unescape(html[pos : match.start()])
+        if match.group("cdata"):
+            yield match.group("cdata")
+        pos = match.end()
+    if pos < len(html):
+        yield unescape(html[pos:])
+
+
+def page_text(html: str) -> str:
+    """Return the text of `html`, as BeautifulSoup's `get_text()` would."""
+    return "".join(_strings(html))
+
+
+def body_strings(html: str) -> list[str]:
+    """Return the text nodes inside `<body>`, as `soup.body.strings` would."""
+    start = _BODY_START.search(html)
+    if start is None:
+        return []
+    end = _BODY_END.search(html, start.end())
+    return list(_strings(html[start.end() : end.start() if end else len(html)]))
@@ -0,0 +1,164 @@
+"""Concurrent fetch engine shared by the bibliography commands."""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class TokenBucket:
+    """Thread-safe token bucket limiting the global request rate.
+
+    `rate` tokens are added per second up to `capacity`; each request takes
+    one token and blocks until one is available.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        if rate <= 0:
+            raise ValueError(f"rate must be positive, got {rate}")
+        self.rate = rate
+        self.capacity = max(capacity, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while wait := self.try_acquire():
+            time.sleep(wait)
+
+    def try_acquire(self) -> float:
+        """Take a token if one is available; else return seconds until one is.
+
+        Lets event-loop callers wait with `asyncio.sleep` instead of blocking.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.capacity, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return 0.0
+            return (1.0 - self._tokens) / self.rate
+
+
+class AdaptiveLimiter:
+    """AIMD limit on the requests in flight to one server.
+
+    Until the first cut, each success raises the limit by `increase`, so it
+    doubles every round trip; after that each success adds
+    `increase / limit`, about `increase` per round trip, up to `maximum`.
+    A busy response or a latency spike, more than `spike` times the running
+    baseline, multiplies it by `decrease`. That happens at most once per
+    baseline latency, so one burst of errors from the same window counts
+    once. A Retry-After pauses every new request until it has passed.
+    """
+
+    def __init__(
+        self,
+        maximum: int,
+        minimum: int = 1,
+        increase: float = 1.0,
+        decrease: float = 0.5,
+        spike: float = 3.0,
+        warmup: int = 10,
+    ):
+        if maximum < minimum or minimum < 1:
+            raise ValueError(f"need 1 <= minimum <= maximum, got {minimum}, {maximum}")
+        self.maximum = maximum
+        self.minimum = minimum
+        self.increase = increase
+        self.decrease = decrease
+        self.spike = spike
+        self.warmup = warmup
+        self.limit = float(minimum)
+        self.baseline: float | None = None
+        self._samples = 0
+        self._in_flight = 0
+        self._paused_until = 0.0
+        self._last_decrease = float("-inf")
+        self._slow_start = True
+        self._cond = threading.Condition()
+
+    def acquire(self) -> None:
+        with self._cond:
+            while True:
+                wait = self._paused_until - time.monotonic()
+                if wait <= 0 and self._in_flight < int(self.limit):
+                    self._in_flight += 1
+                    return
+                self._cond.wait(wait if wait > 0 else None)
+
+    def release(
+        self,
+        latency: float | None,
+        busy: bool = False,
+        retry_after: float | None = None,
+    ) -> bool:
+        """Record one finished request; return True if the limit was cut.
+
+        `latency` is the server's response time, None when the request
+        failed before a response arrived.
+        """
+        with self._cond:
+            self._in_flight -= 1
+            now = time.monotonic()
+            if retry_after:
+                self._paused_until = max(self._paused_until, now + retry_after)
+            spiked = False
+            if latency is not None:
+                spiked = (
+                    self._samples >= self.warmup
+                    and latency > self.spike * self.baseline
+                )
+                self._samples += 1
+                self.baseline = (
+                    latency
+                    if self.baseline is None
+                    else 0.95 * self.baseline + 0.05 * latency
+                )
+            cut = False
+            if busy or spiked:
+                if now - self._last_decrease >= (self.baseline or 0.0):
+                    self.limit = max(self.minimum, self.limit * self.decrease)
+                    self._last_decrease = now
+                    self._slow_start = False
+                    cut = True
+            elif latency is not None:
+                step = self.increase if self._slow_start else self.increase / self.limit
+                self.limit = min(self.maximum, self.limit + step)
+            self._cond.notify_all()
+            return cut
+
+
+def fetch_ordered(
+    func: Callable[[T], R], items: Iterable[T], workers: int = 4
+) -> Iterator[tuple[T, R]]:
+    """Run `func` over `items` on a thread pool, yielding in input order.
+
+    At most `2 * workers` items are in flight at once, so `items` may be a
+    lazy iterator over a large result set.
+    """
+    if workers < 1:
+        raise ValueError(f"workers must be at least 1, got {workers}")
+
+    window = 2 * workers
+    pending: deque[tuple[T, Future]] = deque()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        try:
+            for item in items:
+                pending.append((item, executor.submit(func, item)))
+                if len(pending) >= window:
+                    head, future = pending.popleft()
+                    yield head, future.result()
+            while pending:
+                head, future = pending.popleft()
+                yield head, future.result()
+        finally:
+            for _, future in pending:
+                future.cancel()
@@ -0,0 +1,486 @@
+"""Local ISC event index: schema, migration and query building."""
+
+import csv
+import re
+import sqlite3
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from eq_fetch import BibliographyCriteria
+
+_DB_PATH = Path("data/event_index.db")
+_MMAP_SIZE = 256 * 1024 * 1024
+
+SCHEMA_VERSION = 3
+
+_TABLE_V1 = """
+CREATE TABLE isc_events (
+    ISC_event INTEGER PRIMARY KEY,
+    Agency TEXT,
+    Origin_Time INTEGER NOT NULL,  -- seconds since 1970-01-01T00:00:00 UTC
+    Lat REAL,
+    Lon REAL,
+    Depth REAL,
+    Mag REAL,
+    N INTEGER NOT NULL DEFAULT 0,
+    Event_code TEXT
+);
+"""
+
+_INDEXES = """
+CREATE INDEX idx_isc_events_time ON isc_events (Origin_Time, Mag, Depth);
+CREATE INDEX idx_isc_events_mag ON isc_events (Mag, Origin_Time);
+CREATE INDEX idx_isc_events_depth ON isc_events (Depth, Origin_Time);
+"""
+
+# Copies the untyped, unindexed pandas.to_sql table into the typed schema.
+_COPY_LEGACY = """
+INSERT INTO isc_events
+SELECT CAST(ISC_event AS INTEGER), Agency,
+       CAST(strftime('%s', Origin_Time) AS INTEGER),
+       Lat, Lon, Depth, Mag, COALESCE(N, 0), Event_code
+FROM isc_events_legacy
+WHERE ISC_event IS NOT NULL AND Origin_Time IS NOT NULL
+"""
+
+# R*Tree over (lat, lon, depth) points, kept in step with isc_events by
+# triggers so every writer of the index maintains it.
+_RTREE_TABLE = """
+CREATE VIRTUAL TABLE isc_events_rtree USING rtree(
+    ISC_event, min_lat, max_lat, min_lon, max_lon, min_dep, max_dep
+);
+INSERT INTO isc_events_rtree
+SELECT ISC_event, Lat, Lat, Lon, Lon, Depth, Depth FROM isc_events
+WHERE Lat IS NOT NULL AND Lon IS NOT NULL AND Depth IS NOT NULL;
+"""
+
+_RTREE_TRIGGERS = """
+CREATE TRIGGER isc_events_rtree_insert AFTER INSERT ON isc_events
+WHEN NEW.Lat IS NOT NULL AND NEW.Lon IS NOT NULL AND NEW.Depth IS NOT NULL
+BEGIN
+    INSERT INTO isc_events_rtree VALUES (
+        NEW.ISC_event, NEW.Lat, NEW.Lat, NEW.Lon, NEW.Lon, NEW.Depth, NEW.Depth
+    );
+END;
+CREATE TRIGGER isc_events_rtree_update AFTER UPDATE OF Lat, Lon, Depth ON isc_events
+BEGIN
+    DELETE FROM isc_events_rtree WHERE ISC_event = OLD.ISC_event;
+    INSERT INTO isc_events_rtree
+    SELECT NEW.ISC_event, NEW.Lat, NEW.Lat, NEW.Lon, NEW.Lon, NEW.Depth, NEW.Depth
+    WHERE NEW.Lat IS NOT NULL AND NEW.Lon IS NOT NULL AND NEW.Depth IS NOT NULL;
+END;
+CREATE TRIGGER isc_events_rtree_delete AFTER DELETE ON isc_events
+BEGIN
+    DELETE FROM isc_events_rtree WHERE ISC_event = OLD.ISC_event;
+END;
+"""
+
+# Catalogue dumps carry no reference counts, so N becomes nullable: NULL
+# means unknown, 0 means the event has no references.
+_TABLE_V3 = """
+CREATE TABLE isc_events_v3 (
+    ISC_event INTEGER PRIMARY KEY,
+    Agency TEXT,
+    Origin_Time INTEGER NOT NULL,  -- seconds since 1970-01-01T00:00:00 UTC
+    Lat REAL,
+    Lon REAL,
+    Depth REAL,
+    Mag REAL,
+    N INTEGER,
+    Event_code TEXT
+);
+INSERT INTO isc_events_v3 SELECT * FROM isc_events;
+DROP TABLE isc_events;
+ALTER TABLE isc_events_v3 RENAME TO isc_events;
+"""
+
+_UPSERT = """
+INSERT INTO isc_events VALUES (?1, ?2, ?3, ?4, ?5, ?6, ?7, ?8, ?9)
+ON CONFLICT (ISC_event) DO UPDATE SET
+    Agency = excluded.Agency,
+    Origin_Time = excluded.Origin_Time,
+    Lat = excluded.Lat,
+    Lon = excluded.Lon,
+    Depth = excluded.Depth,
+    Mag = excluded.Mag,
+    N = COALESCE(excluded.N, isc_events.N),
+    Event_code = COALESCE(excluded.Event_code, isc_events.Event_code)
+"""
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def _run_script(conn: sqlite3.Connection, script: str) -> None:
+    # executescript() would commit the surrounding migration transaction.
+    statement = ""
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            conn.execute(statement)
+            statement = ""
+
+
+def _migrate_v1(conn: sqlite3.Connection) -> None:
+    legacy = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'isc_events'"
+    ).fetchone()
+    if legacy:
+        conn.execute("ALTER TABLE isc_events RENAME TO isc_events_legacy")
+    _run_script(conn, _TABLE_V1 + _INDEXES)
+    if legacy:
+        conn.execute(_COPY_LEGACY)
+        conn.execute("DROP TABLE isc_events_legacy")
+
+
+def _migrate_v2(conn: sqlite3.Connection) -> None:
+    _run_script(conn, _RTREE_TABLE + _RTREE_TRIGGERS)
+
+
+def _migrate_v3(conn: sqlite3.Connection) -> None:
+    _run_script(conn, _TABLE_V3 + _INDEXES + _RTREE_TRIGGERS)
+
+
+_MIGRATIONS = {1: _migrate_v1, 2: _migrate_v2, 3: _migrate_v3}
+
+
+def migrate(path: Path = _DB_PATH) -> int:
+    """Upgrade the index at `path` to the current schema, creating it if needed.
+
+    Returns the number of events in the migrated table, or -1 if the index
+    was already up to date.
+    """
+    conn = sqlite3.connect(path, isolation_level=None)
+    try:
+        version = schema_version(conn)
+        if version >= SCHEMA_VERSION:
+            return -1
+        conn.execute("BEGIN")
+        for step in range(version + 1, SCHEMA_VERSION + 1):
+            _MIGRATIONS[step](conn)
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        conn.execute("COMMIT")
+        conn.execute("ANALYZE")
+        conn.execute("VACUUM")
+        return conn.execute("SELECT COUNT(*) FROM isc_events").fetchone()[0]
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+
+def connect(path: Path = _DB_PATH) -> sqlite3.Connection:
+    """Open the index read-only and immutable, memory-mapped for queries."""
+    path = Path(path)
+    if not path.exists():
+        raise sqlite3.OperationalError(f"event index not found: {path}")
+    conn = sqlite3.connect(f"{path.resolve().as_uri()}?mode=ro&immutable=1", uri=True)
+    conn.execute(f"PRAGMA mmap_size = {_MMAP_SIZE}")
+    if schema_version(conn) < SCHEMA_VERSION:
+        conn.close()
+        raise sqlite3.DatabaseError(
+            f"{path} uses an old schema; run `eq-fetch index migrate` first."
+        )
+    return conn
+
+
+def _epoch(date: str, time: str = "") -> int:
+    text = f"{date.strip().replace('/', '-')}T{time.strip()}" if time else date.strip()
+    # Whole seconds, as in the original index; fractions are truncated.
+    moment = datetime.fromisoformat(text.rstrip("Z").split(".")[0])
+    return int(moment.replace(tzinfo=timezone.utc).timestamp())
+
+
+def _float(text: str) -> float | None:
+    text = text.strip()
+    return float(text) if text else None
+
+
+def _read_index_csv(lines: Iterable[str]) -> Iterator[tuple]:
+    # CSV with the index's own columns, e.g. exported from another index.
+    for row in csv.DictReader(lines):
+        if not (row.get("ISC_event") or "").strip():
+            continue
+        n = (row.get("N") or "").strip()
+        yield (
+            int(float(row["ISC_event"])),
+            (row.get("Agency") or "").strip() or None,
+            _epoch(row["Origin_Time"]),
+            _float(row.get("Lat") or ""),
+            _float(row.get("Lon") or ""),
+            _float(row.get("Depth") or ""),
+            _float(row.get("Mag") or ""),
+            int(n) if n else None,
+            (row.get("Event_code") or "").strip() or None,
+        )
+
+
+def _read_isc_csv(lines: Iterable[str]) -> Iterator[tuple]:
+    # ISC catalogue CSV: EVENTID,TYPE,AUTHOR,DATE,TIME,LAT,LON,DEPTH,DEPFIX
+    # followed by repeated AUTHOR,TYPE,MAG magnitude triples.
+    for row in csv.reader(lines):
+        if len(row) < 9 or not row[0].strip().isdigit():
+            continue
+        mags = [m for m in (_float(v) for v in row[11::3]) if m is not None]
+        yield (
+            int(row[0]),
+            row[2].strip() or None,
+            _epoch(row[3], row[4]),
+            _float(row[5]),
+            _float(row[6]),
+            _float(row[7]),
+            max(mags) if mags else None,
+            None,
+            None,
+        )
+
+
+_ISF_EVENT = re.compile(r"^Event\s+(\d+)")
+
+
+def _read_isf(lines: Iterable[str]) -> Iterator[tuple]:
+    # ISF/IMS1.0 bulletin: the prime origin (or the last one listed) and the
+    # largest magnitude of each event block, read from the fixed columns.
+    event_id, origins, prime, mags, section = None, [], None, [], None
+
+    def emit():
+        origin = prime or (origins[-1] if origins else None)
+        if event_id is not None and origin is not None:
+            yield (event_id, *origin, max(mags) if mags else None, None, None)
+
+    for line in lines:
+        line = line.rstrip("\r\n")
+        match = _ISF_EVENT.match(line)
+        if match:
+            yield from emit()
+            event_id, origins, prime, mags = int(match.group(1)), [], None, []
+            section = None
+        elif line.startswith("   Date       Time"):
+            section = "origin"
+        elif line.startswith("Magnitude"):
+            section = "magnitude"
+        elif not line.strip():
+            section = None
+        elif section == "origin" and line[:1].isdigit():
+            origins.append(
+                (
+                    line[118:127].strip() or None,
+                    _epoch(line[0:10], line[11:22]),
+                    _float(line[36:44]),
+                    _float(line[45:54]),
+                    _float(line[71:76]),
+                )
+            )
+        elif section == "origin" and "#PRIME" in line and origins:
+            prime = origins[-1]
+        elif section == "magnitude" and line[:1].isalpha():
+            value = _float(line[6:10])
+            if value is not None:
+                mags.append(value)
+    yield from emit()
+
+
+def read_catalogue(path: Path) -> Iterator[tuple]:
+    """Yield isc_events rows from an ISC catalogue CSV, ISF file or index CSV."""
+    with open(path, encoding="utf-8", errors="replace", newline="") as f:
+        head = f.read(65536)
+        f.seek(0)
+        if re.search(r"^Event\s+\d+", head, re.MULTILINE):
+            yield from _read_isf(f)
+        elif re.search(r"^\s*EVENTID\s*,", head, re.MULTILINE):
+            yield from _read_isc_csv(f)
+        elif head and "ISC_event" in head.splitlines()[0]:
+            yield from _read_index_csv(f)
+        else:
+            raise ValueError(f"{path}: not an ISC catalogue CSV, ISF or index CSV file")
+
+
+def ingest(
+    paths: Iterable[Path],
+    db: Path = _DB_PATH,
+    full: bool = False,
+    batch_size: int = 50000,
+) -> tuple[int, int]:
+    """Bulk upsert catalogue files into the index, creating it if needed.
+
+    Only events newer than the index's latest origin time are loaded unless
+    `full` is set. Returns the number of rows read and rows upserted.
+    Readers open the index as immutable, so do not run fetches against the
+    index while it is being ingested into.
+    """
+    migrate(db)
+    conn = sqlite3.connect(db, isolation_level=None)
+    read = written = 0
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA cache_size=-262144")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        high_water = None
+        if not full:
+            high_water = conn.execute(
+                "SELECT MAX(Origin_Time) FROM isc_events"
+            ).fetchone()[0]
+
+        batch: list[tuple] = []
+
+        def flush():
+            conn.execute("BEGIN")
+            conn.executemany(_UPSERT, batch)
+            conn.execute("COMMIT")
+            batch.clear()
+
+        for path in paths:
+            for row in read_catalogue(path):
+                read += 1
+                if high_water is not None and row[2] < high_water:
+                    continue
+                batch.append(row)
+                written += 1
+                if len(batch) >= batch_size:
+                    flush()
+        if batch:
+            flush()
+        conn.execute("PRAGMA optimize")
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        # Leave a self-contained file for the read-only immutable readers.
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        conn.execute("PRAGMA journal_mode=DELETE")
+        conn.close()
+    return read, written
+
+
+def _bounds(values: list[float], default: list[float]) -> list[float]:
+    return sorted(values) if values and len(values) == 2 else sorted(default)
+
+
+def lon_ranges(lons: list[float]) -> list[tuple[float, float]]:
+    """Split a west-to-east longitude range into ranges within [-180, 180].
+
+    `lons` is read as [west, east], so [170, -170] is the 20 degrees across
+    the antimeridian. An empty list means the range covers every longitude.
+    """
+    west, east = lons
+    if east < west:
+        east += 360.0
+    if east - west >= 360.0:
+        return []
+    if not -180.0 <= west < 180.0:
+        east -= west
+        west = (west + 180.0) % 360.0 - 180.0
+        east += west
+    if east <= 180.0:
+        return [(west, east)]
+    return [(west, 180.0), (-180.0, east - 360.0)]
+
+
+def query_plan(conn: sqlite3.Connection, query: str, params: list) -> list[str]:
+    """Return SQLite's EXPLAIN QUERY PLAN for `query`, one indented line per step."""
+    rows = conn.execute(f"EXPLAIN QUERY PLAN {query}", params).fetchall()
+    depth = {0: -1}
+    lines = []
+    for node, parent, _, detail in rows:
+        depth[node] = depth.get(parent, -1) + 1
+        lines.append("  " * depth[node] + detail)
+    return lines
+
+
+# Fetch priorities; ties fall back to newest first, the order the original
+# index was written in.
+_ORDERS = {
+    "time": "Origin_Time DESC, ISC_event DESC",
+    "refs": "N IS NULL, N DESC, Origin_Time DESC, ISC_event DESC",
+    "mag": "Mag DESC, Origin_Time DESC, ISC_event DESC",
+}
+ORDERS = tuple(_ORDERS)
+
+
+def build_event_query(
+    criteria: BibliographyCriteria,
+    order: str = "time",
+    skip_unreferenced: bool = False,
+) -> tuple[str, list]:
+    """Return the SQL and parameters selecting events matching `criteria`.
+
+    `order` is one of `ORDERS`: newest first, most references first (events
+    with an unknown count last) or largest magnitude first. With
+    `skip_unreferenced`, events whose reference count is known to be zero
+    are left out since their bibliography pages are empty.
+
+    When the criteria narrow latitude, longitude or depth, candidates are
+    taken from the R*Tree first, one box per longitude range, so a range
+    across the antimeridian is two indexed lookups rather than a near-global
+    scan. The exact BETWEEN filters still apply since the R*Tree stores
+    coordinates at single precision.
+    """
+    default = BibliographyCriteria()
+    lats = _bounds(criteria.lats, default.lats)
+    deps = _bounds(criteria.deps, default.deps)
+    lons = (
+        lon_ranges(criteria.lons) if criteria.lons and len(criteria.lons) == 2 else []
+    )
+
+    query = (
+        "SELECT ISC_event, Origin_Time, Lat, Lon, Depth, Mag, N"
+        " FROM isc_events WHERE 1=1"
+    )
+    params: list = []
+
+    if criteria.start_time:
+        query += " AND Origin_Time >= ?"
+        params.append(criteria.start_time.timestamp)
+
+    if criteria.end_time:
+        query += " AND Origin_Time <= ?"
+        params.append(criteria.end_time.timestamp)
+
+    if lons or lats != sorted(default.lats) or deps != sorted(default.deps):
+        box = (
+            "SELECT ISC_event FROM isc_events_rtree"
+            " WHERE max_lat >= ? AND min_lat <= ? AND max_dep >= ? AND min_dep <= ?"
+        )
+        boxes = []
+        for west, east in lons or [(None, None)]:
+            if west is None:
+                boxes.append(box)
+                params.extend([*lats, *deps])
+            else:
+                boxes.append(box + " AND max_lon >= ? AND min_lon <= ?")
+                params.extend([*lats, *deps, west, east])
+        query += f" AND ISC_event IN ({' UNION ALL '.join(boxes)})"
+
+    if criteria.lats and len(criteria.lats) == 2:
+        query += " AND Lat BETWEEN ? AND ?"
+        params.extend(lats)
+
+    if lons:
+        query += " AND (" + " OR ".join(["Lon BETWEEN ? AND ?"] * len(lons)) + ")"
+        for west, east in lons:
+            params.extend([west, east])
+
+    # A unary + keeps the default, match-everything ranges from steering the
+    # planner onto the depth or magnitude index instead of the time index.
+    if criteria.deps and len(criteria.deps) == 2:
+        column = "Depth" if deps != sorted(default.deps) else "+Depth"
+        query += f" AND {column} BETWEEN ? AND ?"
+        params.extend(deps)
+
+    if criteria.mags and len(criteria.mags) == 2:
+        mags = sorted(criteria.mags)
+        column = "Mag" if mags != sorted(default.mags) else "+Mag"
+        query += f" AND {column} BETWEEN ? AND ?"
+        params.extend(mags)
+
+    if skip_unreferenced:
+        query += " AND (N IS NULL OR N > 0)"
+
+    query += f" ORDER BY {_ORDERS[order]}"
+    return query, params
@@ -0,0 +1,54 @@
+"""Run journal recording completed events so biblio-fetch runs can resume."""
+
+import hashlib
+import json
+import sqlite3
+import time
+from pathlib import Path
+
+from eq_fetch import BibliographyCriteria
+
+_JOURNAL_DIR = Path("data/runs")
+
+
+def criteria_key(criteria: BibliographyCriteria) -> str:
+    """Return a stable hash identifying a run by its search criteria."""
+    fields = {name: str(value) for name, value in sorted(vars(criteria).items())}
+    payload = json.dumps(fields, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()[:16]
+
+
+class RunJournal:
+    """SQLite journal of the events a run has fully written to its output."""
+
+    def __init__(self, key: str, directory: Path = _JOURNAL_DIR):
+        self.key = key
+        self.path = Path(directory) / f"{key}.db"
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS done ("
+            " evid INTEGER PRIMARY KEY,"
+            " finished_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def completed(self) -> set[int]:
+        return {row[0] for row in self._conn.execute("SELECT evid FROM done")}
+
+    def mark_done(self, event_ids: list[str]) -> None:
+        now = time.time()
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO done (evid, finished_at) VALUES (?, ?)",
+            [(int(event_id), now) for event_id in event_ids],
+        )
+        self._conn.commit()
+
+    def reset(self) -> None:
+        self._conn.execute("DELETE FROM done")
+        self._conn.commit()
+
+    def close(self) -> None:
+        self._conn.close()
@@ -0,0 +1,173 @@
+"""Opt-in per-stage timers, counters and latency histograms.
+
+Instrumented code calls the module-level `timer`, `count` and `observe`
+helpers, which do nothing until `enable` installs a collector, so unprofiled
+runs pay only a function call per hook.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import json
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterator
+
+# Every command imports this module; rich.table loads only for a report.
+if TYPE_CHECKING:
+    from rich.table import Table
+
+# Upper bounds, in seconds, of the latency histogram buckets.
+_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, float("inf"))
+
+
+def _quantile(ordered: list[float], q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class Metrics:
+    """Thread-safe collector of stage timings, counters and latency samples."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+        self.timers: dict[str, list[float]] = {}
+        self.counters: dict[str, int] = {}
+        self.samples: dict[str, list[float]] = {}
+
+    def add_time(self, name: str, seconds: float) -> None:
+        with self._lock:
+            timer = self.timers.setdefault(name, [0, 0.0])
+            timer[0] += 1
+            timer[1] += seconds
+
+    def count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def observe(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.samples.setdefault(name, []).append(seconds)
+
+    def histogram(self, name: str) -> dict:
+        """Return count, quantiles and bucket counts for the samples of `name`."""
+        with self._lock:
+            ordered = sorted(self.samples.get(name, []))
+        if not ordered:
+            return {"count": 0}
+        buckets, start = {}, 0
+        for bound in _BUCKETS:
+            end = start
+            while end < len(ordered) and ordered[end] <= bound:
+                end += 1
+            buckets["+Inf" if bound == float("inf") else f"{bound:g}"] = end - start
+            start = end
+        return {
+            "count": len(ordered),
+            "mean": sum(ordered) / len(ordered),
+            "p50": _quantile(ordered, 0.50),
+            "p90": _quantile(ordered, 0.90),
+            "p99": _quantile(ordered, 0.99),
+            "max": ordered[-1],
+            "buckets": buckets,
+        }
+
+    def to_dict(self) -> dict:
+        from importlib import metadata
+
+        try:
+            version = metadata.version("eq-fetch")
+        except metadata.PackageNotFoundError:
+            version = None
+        with self._lock:
+            timers = {
+                name: {"count": n, "seconds": seconds}
+                for name, (n, seconds) in self.timers.items()
+            }
+            counters = dict(self.counters)
+            names = list(self.samples)
+        return {
+            "version": version,
+            "elapsed": time.perf_counter() - self._started,
+            "timers": timers,
+            "counters": counters,
+            "histograms": {name: self.histogram(name) for name in names},
+        }
+
+    def dump(self, path: Path) -> None:
+        Path(path).write_text(json.dumps(self.to_dict(), indent=2) + "\n")
+
+    def table(self) -> Table:
+        """Render the collected metrics as a rich table."""
+        from rich.table import Table
+
+        data = self.to_dict()
+        table = Table(title=f"Profile ({data['elapsed']:.2f}s wall)")
+        table.add_column("Metric")
+        table.add_column("Count", justify="right")
+        table.add_column("Total", justify="right")
+        table.add_column("Mean", justify="right")
+        for name, timer in sorted(data["timers"].items()):
+            mean = timer["seconds"] / timer["count"] * 1000
+            table.add_row(
+                name, str(timer["count"]), f"{timer['seconds']:.3f}s", f"{mean:.2f}ms"
+            )
+        for name, value in sorted(data["counters"].items()):
+            table.add_row(name, str(value), "", "")
+        for name, hist in sorted(data["histograms"].items()):
+            if not hist["count"]:
+                continue
+            table.add_section()
+            table.add_row(
+                name,
+                str(hist["count"]),
+                f"p50 {hist['p50'] * 1000:.0f}ms / p99 {hist['p99'] * 1000:.0f}ms",
+                f"{hist['mean'] * 1000:.2f}ms",
+            )
+            for bound, n in hist["buckets"].items():
+                if n:
+                    label = (
+                        f"> {_BUCKETS[-2]:g}s" if bound == "+Inf" else f"<= {bound}s"
+                    )
+                    table.add_row(f"  {label}", str(n), "", "")
+        return table
+
+
+_active: Metrics | None = None
+
+
+def enable() -> Metrics:
+    """Start collecting into a fresh `Metrics` and return it."""
+    global _active
+    _active = Metrics()
+    return _active
+
+
+def disable() -> None:
+    global _active
+    _active = None
+
+
+@contextlib.contextmanager
+def timer(name: str) -> Iterator[None]:
+    """Time the enclosed block under `name` when collection is enabled."""
+    active = _active
+    if active is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        active.add_time(name, time.perf_counter() - started)
+
+
+def count(name: str, n: int = 1) -> None:
+    if _active is not None:
+        _active.count(name, n)
+
+
+def observe(name: str, seconds: float) -> None:
+    if _active is not None:
+        _active.observe(name, seconds)
@@ -2,10 +2,11 @@
 
 import numpy as np
 import pandas as pd
-import requests
-from bs4 import BeautifulSoup
 from obspy.core import UTCDateTime
 
+from eq_fetch import transport
+from eq_fetch.extract import body_strings
+
 
 def _dict_bibli_search(searcher, args):
     """arg -> search parameters."""
@@ -39,7 +40,7 @@ def format_url(searcher, args):
     # Extract search params
     _dict_bibli_search(searcher, args)
     # Format URL
-    base = "https://www.isc.ac.uk/cgi-bin/bibsearch.pl"
+    base = transport.isc_url("cgi-bin/bibsearch.pl")
     shape = f"?searchshape={searcher.shape}"
     coords = f"&coordvals={searcher.coords}"
     start_year = f"&start_year={searcher.start_date.year}"
@@ -82,20 +83,18 @@ def fetch_url(url):
     """Fetch html and parse out body text."""
     print("Search URL:\n", url)
     # reqest web page
-    response = requests.get(url)
+    response = transport.get(url)
     # get HTML text
     html = response.text
-    # parse the HTML
-    soup = BeautifulSoup(html, "html.parser")
     # isolate body text
-    body = soup.body
+    body = body_strings(html)
 
     return body
 
 
 def parse_bibli_page(searcher, body, iter_search=False):
     """Parse catalog from html body text."""
-    lines = [line for line in body.strings]
+    lines = [line for line in body]
     # Check empty search
     if "No events with references were found" in lines[23]:
         print()
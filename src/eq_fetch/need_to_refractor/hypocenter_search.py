@@ -2,9 +2,10 @@ from datetime import timedelta
 from xml.etree import ElementTree
 
 import pandas as pd
-import requests
 from obspy.core import UTCDateTime
 
+from eq_fetch import transport
+
 
 def _dict_bibli_search(searcher, args):
     """
@@ -53,7 +54,7 @@ def format_url(searcher, args):
     # Extract search params
     _dict_bibli_search(searcher, args)
     # Format URL
-    base = "https://www.isc.ac.uk/cgi-bin/web-db-run"
+    base = transport.isc_url("cgi-bin/web-db-run")
     request = f"?request={searcher.reviewed}"
     output_format = "&out_format=QuakeML"
     # TODO: setup saerch region
@@ -118,7 +119,7 @@ def fetch_xml(url):
     """
     print("Searching URL...\n", url, "\n")
 
-    response = requests.get(url)
+    response = transport.get(url)
     xml_data = response.content
 
     return xml_data
@@ -0,0 +1,79 @@
+"""Quarantine of bibliography pages the parser could not read.
+
+A page whose layout `biblio-fetch` does not recognise is saved raw, with
+its event id and the reason, instead of aborting the run. Each record also
+keeps the output and entry filters of the run that fetched it, so
+`biblio-fetch --reprocess-quarantine` can parse the saved pages again with
+an updated parser and append the rows that run missed, without refetching.
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Iterator
+
+_QUARANTINE_DIR = Path("data/quarantine")
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+class Quarantine:
+    """Directory of raw pages as `<evid>.html`, each with an `<evid>.json` record.
+
+    `context` is stored in every record added. Workers fetching concurrently
+    write separate files, so only the `added` count is locked.
+    """
+
+    def __init__(
+        self, directory: Path | str = _QUARANTINE_DIR, context: dict | None = None
+    ):
+        self.directory = Path(directory)
+        self.context = context or {}
+        self.added = 0
+        self._lock = threading.Lock()
+
+    def add(self, event_id: str, html: str, reason: str, url: str) -> Path:
+        """Save `html` for `event_id`, replacing an earlier copy; return its path."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        page = self.directory / f"{event_id}.html"
+        _write_atomic(page, html.encode("utf-8"))
+        record = {
+            "evid": event_id,
+            "reason": reason,
+            "url": url,
+            "quarantined_at": time.time(),
+            "attempts": 0,
+            **self.context,
+        }
+        _write_atomic(
+            page.with_suffix(".json"), json.dumps(record, indent=2).encode("utf-8")
+        )
+        with self._lock:
+            self.added += 1
+        return page
+
+    def records(self) -> Iterator[tuple[dict, str]]:
+        """Yield (record, html) for every quarantined page, by event id."""
+        if not self.directory.is_dir():
+            return
+        for path in sorted(self.directory.glob("*.json")):
+            page = path.with_suffix(".html")
+            if page.exists():
+                record = json.loads(path.read_text(encoding="utf-8"))
+                yield record, page.read_text(encoding="utf-8")
+
+    def retain(self, record: dict, reason: str) -> None:
+        """Keep a page that failed again, recording the new reason."""
+        record = {**record, "reason": reason, "attempts": record["attempts"] + 1}
+        path = self.directory / f"{record['evid']}.json"
+        _write_atomic(path, json.dumps(record, indent=2).encode("utf-8"))
+
+    def remove(self, event_id: str) -> None:
+        for suffix in (".json", ".html"):
+            (self.directory / f"{event_id}{suffix}").unlink(missing_ok=True)
@@ -0,0 +1,39 @@
+"""Batch Flinn-Engdahl region lookup for event result sets."""
+
+import functools
+
+import flinnengdahl
+import numpy as np
+
+
+@functools.lru_cache(maxsize=1)
+def _regionalizer() -> flinnengdahl.FlinnEngdahl:
+    return flinnengdahl.FlinnEngdahl()
+
+
+@functools.lru_cache(maxsize=65536)
+def region_name(lat: float, lon: float) -> str:
+    """Return the Flinn-Engdahl region name for one epicentre."""
+    return _regionalizer().name(lat, lon)
+
+
+def region_names(lats, lons) -> list[str]:
+    """Return region names for arrays of latitudes and longitudes.
+
+    The regionalizer reads only the quadrant and the whole degrees of each
+    coordinate, truncated toward zero, so epicentres are grouped by that
+    one-degree cell and each cell is resolved once, through its first event.
+    A result set therefore costs at most one lookup per cell of the globe.
+    """
+    lats = np.asarray(lats, dtype=float)
+    lons = np.asarray(lons, dtype=float)
+    if not len(lats):
+        return []
+    cells = np.column_stack(
+        [lats >= 0, np.trunc(np.abs(lats)), lons >= 0, np.trunc(np.abs(lons))]
+    )
+    _, first, inverse = np.unique(cells, axis=0, return_index=True, return_inverse=True)
+    names = np.array(
+        [region_name(lats[i], lons[i]) for i in first.tolist()], dtype=object
+    )
+    return names[inverse.ravel()].tolist()
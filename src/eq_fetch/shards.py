@@ -0,0 +1,263 @@
+"""Shared work queue splitting one bibliography run across processes and hosts.
+
+`eq-fetch shard plan` records the matched events, in fetch order, as
+fixed-size shards in a SQLite file. Workers that can see the file claim a
+shard under a lease, renew it while they fetch, and leave the shard's rows
+as a partial output next to the queue. A lease that is not renewed expires
+and the shard returns to the pool. Merging the parts in shard order gives
+the output of a single-process run.
+
+The queue uses SQLite's rollback journal rather than WAL, since WAL needs
+shared memory that network filesystems do not provide.
+"""
+
+import json
+import os
+import re
+import shutil
+import sqlite3
+import time
+from pathlib import Path
+from typing import Iterable
+
+from eq_fetch.index import _run_script
+from eq_fetch.writer import StreamingArrowWriter, read_table
+
+EVENT_COLUMNS = ("ISC_event", "Origin_Time", "Lat", "Lon", "Depth", "Mag", "N")
+
+_SCHEMA = """
+CREATE TABLE meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE shards (
+    shard INTEGER PRIMARY KEY,
+    events INTEGER NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',  -- pending, leased or done
+    owner TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    finished_at REAL
+);
+CREATE TABLE events (
+    position INTEGER PRIMARY KEY,
+    shard INTEGER NOT NULL REFERENCES shards (shard),
+    ISC_event INTEGER NOT NULL,
+    Origin_Time INTEGER NOT NULL,
+    Lat REAL,
+    Lon REAL,
+    Depth REAL,
+    Mag REAL,
+    N INTEGER
+);
+CREATE INDEX idx_events_shard ON events (shard, position);
+"""
+
+
+def default_owner() -> str:
+    """Return a worker id unique across the hosts sharing a queue."""
+    return f"{os.uname().nodename}-{os.getpid()}"
+
+
+class WorkQueue:
+    """SQLite queue of event shards claimed by workers under expiring leases."""
+
+    def __init__(self, path: Path | str):
+        self.path = Path(path)
+        if not self.path.exists():
+            raise FileNotFoundError(f"No shard queue at {self.path}")
+        self._conn = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        self.parts_dir = self.path.with_name(self.path.stem + ".parts")
+
+    @classmethod
+    def create(
+        cls,
+        path: Path | str,
+        rows: Iterable[tuple],
+        shard_size: int,
+        meta: dict,
+    ) -> "WorkQueue":
+        """Write `rows` (`EVENT_COLUMNS`, in fetch order) as a new queue."""
+        path = Path(path)
+        if path.exists():
+            raise FileExistsError(f"Shard queue {path} already exists")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".part")
+        tmp.unlink(missing_ok=True)
+        conn = sqlite3.connect(tmp, isolation_level=None)
+        try:
+            conn.execute("BEGIN")
+            _run_script(conn, _SCHEMA)
+            conn.executemany(
+                "INSERT INTO meta (key, value) VALUES (?, ?)",
+                [(key, json.dumps(value)) for key, value in meta.items()],
+            )
+            position = 0
+            for position, row in enumerate(rows, 1):
+                conn.execute(
+                    "INSERT INTO events VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (position, (position - 1) // shard_size + 1, *row),
+                )
+            conn.execute(
+                "INSERT INTO shards (shard, events)"
+                " SELECT shard, COUNT(*) FROM events GROUP BY shard"
+            )
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        os.replace(tmp, path)
+        queue = cls(path)
+        queue.parts_dir.mkdir(exist_ok=True)
+        return queue
+
+    @property
+    def meta(self) -> dict:
+        return {
+            key: json.loads(value)
+            for key, value in self._conn.execute("SELECT key, value FROM meta")
+        }
+
+    def part_path(self, shard: int) -> Path:
+        return self.parts_dir / f"{shard:05d}.{self.meta['format']}"
+
+    def claim(
+        self, owner: str, lease: float, exclude: Iterable[int] = ()
+    ) -> int | None:
+        """Lease the first pending or expired shard not in `exclude` to `owner`."""
+        now = time.time()
+        exclude = list(exclude)
+        skip = f" AND shard NOT IN ({', '.join('?' * len(exclude))})" if exclude else ""
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = self._conn.execute(
+                "SELECT shard FROM shards WHERE (state = 'pending'"
+                f" OR (state = 'leased' AND lease_expires < ?)){skip}"
+                " ORDER BY shard LIMIT 1",
+                (now, *exclude),
+            ).fetchone()
+            if row:
+                self._conn.execute(
+                    "UPDATE shards SET state = 'leased', owner = ?,"
+                    " lease_expires = ?, attempts = attempts + 1 WHERE shard = ?",
+                    (owner, now + lease, row[0]),
+                )
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        return row[0] if row else None
+
+    def heartbeat(self, shard: int, owner: str, lease: float) -> bool:
+        """Extend `owner`'s lease on `shard`; False once the lease was lost."""
+        cursor = self._conn.execute(
+            "UPDATE shards SET lease_expires = ?"
+            " WHERE shard = ? AND owner = ? AND state = 'leased'",
+            (time.time() + lease, shard, owner),
+        )
+        return cursor.rowcount == 1
+
+    def release(self, shard: int, owner: str) -> None:
+        """Return an unfinished shard to the pool."""
+        self._conn.execute(
+            "UPDATE shards SET state = 'pending', owner = NULL, lease_expires = NULL"
+            " WHERE shard = ? AND owner = ? AND state = 'leased'",
+            (shard, owner),
+        )
+
+    def complete(self, shard: int, owner: str, output: Path) -> bool:
+        """Publish `output` as the part of `shard` if `owner` still holds it.
+
+        The part is moved into place while the queue is locked, so a worker
+        whose lease was taken over can never overwrite the new owner's part
+        after that shard is marked done.
+        """
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            held = self._conn.execute(
+                "SELECT 1 FROM shards WHERE shard = ? AND owner = ? AND state = 'leased'",
+                (shard, owner),
+            ).fetchone()
+            if held:
+                os.replace(output, self.part_path(shard))
+                self._conn.execute(
+                    "UPDATE shards SET state = 'done', lease_expires = NULL,"
+                    " finished_at = ? WHERE shard = ?",
+                    (time.time(), shard),
+                )
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        return held is not None
+
+    def events(self, shard: int) -> list[tuple]:
+        """Return the `EVENT_COLUMNS` rows of `shard` in fetch order."""
+        columns = ", ".join(EVENT_COLUMNS)
+        return self._conn.execute(
+            f"SELECT {columns} FROM events WHERE shard = ? ORDER BY position",
+            (shard,),
+        ).fetchall()
+
+    def status(self) -> list[tuple]:
+        """Return (shard, events, state, owner, lease_expires, attempts) rows."""
+        return self._conn.execute(
+            "SELECT shard, events, state, owner, lease_expires, attempts"
+            " FROM shards ORDER BY shard"
+        ).fetchall()
+
+    def unfinished(self) -> list[int]:
+        return [
+            shard
+            for (shard,) in self._conn.execute(
+                "SELECT shard FROM shards WHERE state != 'done' ORDER BY shard"
+            )
+        ]
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+def temp_part(queue: WorkQueue, shard: int, owner: str) -> Path:
+    """Return the private path `owner` writes `shard` to before completing.
+
+    Files left there by earlier owners whose leases expired are removed.
+    """
+    final = queue.part_path(shard)
+    # Arrow writers add their own `.part` suffix to the temporary file.
+    for stale in final.parent.glob(f"{final.stem}.*.tmp*"):
+        stale.unlink(missing_ok=True)
+    safe = re.sub(r"[^\w.-]", "_", owner)
+    return final.with_suffix(f".{safe}.tmp")
+
+
+def merge(queue: WorkQueue, output: Path, schema=None) -> int:
+    """Concatenate every shard's part into `output`; return the shard count.
+
+    CSV parts are joined byte for byte under the first part's header. Arrow
+    parts are rewritten through `StreamingArrowWriter` with `schema`.
+    """
+    unfinished = queue.unfinished()
+    if unfinished:
+        raise RuntimeError(
+            f"{len(unfinished)} shards are not done yet (first: {unfinished[0]})"
+        )
+    fmt = queue.meta["format"]
+    shards = [shard for shard, *_ in queue.status()]
+    output = Path(output)
+    if fmt == "csv":
+        tmp = output.with_name(output.name + ".part")
+        with open(tmp, "wb") as out:
+            for i, shard in enumerate(shards):
+                with open(queue.part_path(shard), "rb") as part:
+                    header = part.readline()
+                    if i == 0:
+                        out.write(header)
+                    shutil.copyfileobj(part, out)
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(tmp, output)
+    else:
+        with StreamingArrowWriter(output, schema, fmt=fmt) as writer:
+            for shard in shards:
+                writer.write_table(read_table(queue.part_path(shard), fmt))
+    return len(shards)
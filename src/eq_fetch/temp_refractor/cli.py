@@ -2,13 +2,20 @@
 
 import click
 from eq_fetch.search import build_query, preview_results
-from eq_fetch.downloader import CATALOG_SOURCES, download_catalog
+from eq_fetch.downloader import CATALOG_SOURCES, download_catalog, prepare_download
 from eq_fetch.filter import interactive_filter
 from eq_fetch.export import export_results
 
 
 @click.command()
-def main():
+@click.option(
+    "--dry-run",
+    "--explain",
+    "dry_run",
+    is_flag=True,
+    help="Show the request that would be sent and exit without downloading.",
+)
+def main(dry_run: bool):
     click.echo("Welcome to Earthquake Fetcher!")
     # 1. Catalog source selection
     sources: list[str] = list(CATALOG_SOURCES.keys())
@@ -18,6 +25,9 @@ def main():
     criteria = click.prompt("Enter search criteria (e.g., start_year=2020 min_mag=6.0)")
     input(criteria)
     params = build_query(source, criteria)
+    if dry_run:
+        click.echo(f"Would request: {prepare_download(source, params)}")
+        return
     # 3. Download + preview results
     results = download_catalog(source, params, dest_path=None)
     summary = preview_results(results)
@@ -26,7 +36,10 @@ def main():
     results = interactive_filter(results)
     # 5. Export
     if click.confirm("Export results?"):
-        fmt = click.prompt("Choose format", type=click.Choice(["csv", "json", "xml"]))
+        fmt = click.prompt(
+            "Choose format",
+            type=click.Choice(["csv", "json", "xml", "parquet", "feather"]),
+        )
         filename = click.prompt("Filename")
         export_results(results, fmt, filename)
         click.echo(f"Saved to {filename}")
@@ -1,24 +1,183 @@
 """Module for Downloading different earthquake catalogs."""
 
-import requests
+import asyncio
+import contextlib
+import contextvars
+import json
 import logging
-from typing import Callable
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Iterable, NamedTuple
+
+import requests
+from rich.progress import (
+    BarColumn,
+    DownloadColumn,
+    Progress,
+    TextColumn,
+    TimeRemainingColumn,
+    TransferSpeedColumn,
+)
 
-from eq_fetch import SearchCriteria
+from eq_fetch import metrics, transport
+from eq_fetch.fetcher import TokenBucket
 
 logger = logging.getLogger(__name__)
 
+_CHUNK_SIZE = 1024 * 1024
+# Times a dropped download is resumed from its .part file before giving up.
+_RESUME_ATTEMPTS = 5
+
+# Set by download_many so concurrent downloads share one live display.
+_progress: contextvars.ContextVar[Progress | None] = contextvars.ContextVar(
+    "_progress", default=None
+)
+
+# Source-specific query parameters, as built by search.build_query.
+SearchCriteria = dict[str, Any]
+
+SOURCE_URLS: dict[str, str] = {
+    "bibli": transport.isc_url("event_bibliography/index.php"),
+    "bulletin": transport.isc_url("iscbulletin/search/catalogue/"),
+    "gcmt": "https://www.globalcmt.org/CMTsearch.html",
+    "scardec": "http://scardec.projects.sismo.ipgp.fr/",
+}
+
+
+def _new_progress() -> Progress:
+    return Progress(
+        TextColumn("{task.description}"),
+        BarColumn(),
+        DownloadColumn(),
+        TransferSpeedColumn(),
+        TimeRemainingColumn(),
+    )
+
+
+def _part_paths(dest_path: str) -> tuple[Path, Path, Path]:
+    dest = Path(dest_path)
+    part = dest.with_name(dest.name + ".part")
+    return dest, part, part.with_name(part.name + ".json")
+
+
+def _resume_headers(part: Path, meta: Path) -> dict[str, str]:
+    """Range headers continuing `part`, or none if it cannot be resumed safely.
+
+    Resuming needs the ETag or Last-Modified of the response the part came
+    from, sent as If-Range, so a changed resource restarts instead of being
+    spliced onto stale bytes. Dynamic search results usually carry neither,
+    so their partial files restart from zero.
+    """
+    if not part.exists() or not meta.exists():
+        return {}
+    validator = json.loads(meta.read_text()).get("validator")
+    offset = part.stat().st_size
+    if not validator or not offset:
+        return {}
+    return {"Range": f"bytes={offset}-", "If-Range": validator}
+
+
+def _stream_download(
+    url: str, params: SearchCriteria, dest_path: str, description: str
+) -> str:
+    """Stream `url` into `dest_path` in constant memory; return `dest_path`.
+
+    The body goes to `<dest_path>.part` chunk by chunk and is moved into
+    place with `os.replace` once complete, so `dest_path` never holds a
+    partial file. A dropped connection, in this call or an earlier one,
+    continues from the part with an HTTP Range request when the server
+    allows it. Progress shows bytes and throughput.
+    """
+    dest, part, meta = _part_paths(dest_path)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    shared = _progress.get()
+    progress = shared or _new_progress()
+    with contextlib.nullcontext() if shared else progress:
+        task = progress.add_task(description, total=None)
+        for attempt in range(_RESUME_ATTEMPTS + 1):
+            # Range offsets count bytes on the wire; ask for them unencoded
+            # so they match the bytes written to the part.
+            headers = {"Accept-Encoding": "identity", **_resume_headers(part, meta)}
+            try:
+                with transport.get(
+                    url, params=params, headers=headers, stream=True
+                ) as response:
+                    if not _receive(response, part, meta, progress, task):
+                        continue
+                break
+            except (
+                requests.exceptions.ChunkedEncodingError,
+                requests.exceptions.ConnectionError,
+            ) as e:
+                if attempt == _RESUME_ATTEMPTS:
+                    raise
+                metrics.count("download_resumes")
+                logger.warning(f"{description} download interrupted ({e}); resuming")
+        else:
+            # Every attempt found the part stale and threw it away.
+            raise requests.exceptions.RequestException(
+                f"{description} download of {url} restarted {_RESUME_ATTEMPTS + 1}"
+                " times without completing; the server keeps answering range"
+                " requests inconsistently"
+            )
+    os.replace(part, dest)
+    meta.unlink(missing_ok=True)
+    return dest_path
+
+
+def _receive(
+    response: requests.Response, part: Path, meta: Path, progress: Progress, task
+) -> bool:
+    """Write `response` to `part`; False if the part was stale and restarted."""
+    offset = part.stat().st_size if part.exists() else 0
+    if response.status_code == 416:
+        # Range past the end: the part is complete if it matches the length.
+        total = response.headers.get("Content-Range", "").rpartition("/")[2]
+        if total.isdigit() and int(total) == offset:
+            progress.update(task, total=offset, completed=offset)
+            return True
+        part.unlink(missing_ok=True)
+        return False
+    response.raise_for_status()
+    resumed = response.status_code == 206 and response.headers.get(
+        "Content-Range", ""
+    ).startswith(f"bytes {offset}-")
+    if response.status_code == 206 and not resumed:
+        part.unlink(missing_ok=True)
+        meta.unlink(missing_ok=True)
+        return False
+    if not resumed:
+        offset = 0
+        validator = response.headers.get("ETag") or response.headers.get(
+            "Last-Modified"
+        )
+        meta.write_text(json.dumps({"url": response.url, "validator": validator}))
+    length = response.headers.get("Content-Length")
+    total = offset + int(length) if length and length.isdigit() else None
+    progress.update(task, total=total, completed=offset)
+    with open(part, "ab" if resumed else "wb") as f:
+        for chunk in response.iter_content(_CHUNK_SIZE):
+            f.write(chunk)
+            metrics.count("bytes_downloaded", len(chunk))
+            progress.advance(task, len(chunk))
+        f.flush()
+        os.fsync(f.fileno())
+        written = f.tell()
+    if total is not None and written < total:
+        raise requests.exceptions.ChunkedEncodingError(
+            f"connection closed after {written} of {total} bytes"
+        )
+    return True
+
 
 # --- Source handlers ---
 def download_isc_event_bibliography(
     params: SearchCriteria, dest_path: str
 ) -> str | None:
-    url = "https://www.isc.ac.uk/event_bibliography/index.php"
+    url = SOURCE_URLS["bibli"]
     try:
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        with open(dest_path, "wb") as f:
-            f.write(response.content)
+        _stream_download(url, params, dest_path, "ISC Event Bibliography")
         logger.info(f"Downloaded ISC Event Bibliography to {dest_path}")
         return dest_path
     except Exception as e:
@@ -32,13 +191,10 @@ def download_isc_bulletin(params: SearchCriteria, dest_path: str) -> str | None:
     params: e.g. {'start_year': 2020, 'end_year': 2022, ...}
     """
     # Example ISC Bulletin URL. Adapt as needed.
-    url = "https://www.isc.ac.uk/iscbulletin/search/catalogue/"
+    url = SOURCE_URLS["bulletin"]
     # Typically, these endpoints require POST/GET with specific parameters.
     try:
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        with open(dest_path, "wb") as f:
-            f.write(response.content)
+        _stream_download(url, params, dest_path, "ISC Bulletin")
         logger.info(f"Downloaded ISC Bulletin to {dest_path}")
         return dest_path
     except Exception as e:
@@ -47,12 +203,9 @@ def download_isc_bulletin(params: SearchCriteria, dest_path: str) -> str | None:
 
 
 def download_gcmt(params: SearchCriteria, dest_path: str) -> str | None:
-    url = "https://www.globalcmt.org/CMTsearch.html"
+    url = SOURCE_URLS["gcmt"]
     try:
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        with open(dest_path, "wb") as f:
-            f.write(response.content)
+        _stream_download(url, params, dest_path, "GCMT")
         logger.info(f"Downloaded GCMT CMT solutions to {dest_path}")
         return dest_path
     except Exception as e:
@@ -61,12 +214,9 @@ def download_gcmt(params: SearchCriteria, dest_path: str) -> str | None:
 
 
 def download_scardec(params: SearchCriteria, dest_path: str) -> str | None:
-    url = "http://scardec.projects.sismo.ipgp.fr/"
+    url = SOURCE_URLS["scardec"]
     try:
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        with open(dest_path, "wb") as f:
-            f.write(response.content)
+        _stream_download(url, params, dest_path, "SCARDEC")
         logger.info(f"Downloaded SCARDEC source time functions to {dest_path}")
         return dest_path
     except Exception as e:
@@ -78,10 +228,7 @@ def download_source(params: SearchCriteria, dest_path: str) -> str | None:
     """Download function Template."""
     url = "url"
     try:
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        with open(dest_path, "wb") as f:
-            f.write(response.content)
+        _stream_download(url, params, dest_path, "SCARDEC")
         logger.info(f"Downloaded SCARDEC source time functions to {dest_path}")
         return dest_path
     except Exception as e:
@@ -90,12 +237,32 @@ def download_source(params: SearchCriteria, dest_path: str) -> str | None:
 
 
 # --- Source registry ---
-CATALOG_SOURCES: dict[str, Callable[SearchCriteria, str | None]] = {
-    "bibli": download_isc_event_bibliography,
-    "bulletin": download_isc_bulletin,
-    "gcmt": download_gcmt,
-    "scardec": download_scardec,
-    # "source": download_source,
+Handler = (
+    Callable[[SearchCriteria, str], str | None]
+    | Callable[[SearchCriteria, str], Awaitable[str | None]]
+)
+
+
+class SourceSpec(NamedTuple):
+    """A catalog source and the load `download_many` may put on it.
+
+    `handler` is a blocking function or a coroutine function. At most
+    `concurrency` of its downloads run at once, started at no more than
+    `rate` per second (unlimited if None). The per-host limiter in
+    `transport` still applies on top, across sources sharing a host.
+    """
+
+    handler: Handler
+    concurrency: int = 1
+    rate: float | None = None
+
+
+CATALOG_SOURCES: dict[str, SourceSpec] = {
+    "bibli": SourceSpec(download_isc_event_bibliography, concurrency=2, rate=1.0),
+    "bulletin": SourceSpec(download_isc_bulletin, concurrency=2, rate=1.0),
+    "gcmt": SourceSpec(download_gcmt, concurrency=4, rate=2.0),
+    "scardec": SourceSpec(download_scardec, concurrency=4, rate=2.0),
+    # "source": SourceSpec(download_source, concurrency=1),
     # Add more sources here as needed
 }
 
@@ -107,8 +274,78 @@ def download_catalog(source: str, params: SearchCriteria, dest_path: str) -> str
     params: Source-specific query parameters.
     dest_path: File path to save the result.
     """
-    handler = CATALOG_SOURCES.get(source)
-    if not handler:
+    spec = CATALOG_SOURCES.get(source)
+    if not spec:
+        logger.error(f"Unknown catalog source: {source}")
+        return None
+    if asyncio.iscoroutinefunction(spec.handler):
+        return asyncio.run(spec.handler(params, dest_path))
+    return spec.handler(params, dest_path)
+
+
+async def download_many_async(
+    jobs: Iterable[tuple[str, SearchCriteria, str]],
+) -> list[str | None]:
+    """Run (source, params, dest_path) jobs concurrently on the running loop.
+
+    Each source gets its own concurrency and rate limit from its
+    `SourceSpec`, so several sources, and several query windows of one
+    source, download side by side. Blocking handlers run in a thread pool
+    sized to those limits and share the pooled sessions of `transport`.
+    Results come back in job order, None for failed or unknown jobs.
+    """
+    jobs = list(jobs)
+    used = {source: CATALOG_SOURCES.get(source) for source, _, _ in jobs}
+    specs = {source: spec for source, spec in used.items() if spec}
+    for source in used.keys() - specs.keys():
+        logger.error(f"Unknown catalog source: {source}")
+    slots = {
+        source: asyncio.Semaphore(spec.concurrency) for source, spec in specs.items()
+    }
+    buckets = {
+        source: TokenBucket(spec.rate) for source, spec in specs.items() if spec.rate
+    }
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(
+        max_workers=max(1, sum(spec.concurrency for spec in specs.values())),
+        thread_name_prefix="download",
+    )
+
+    async def run(source: str, params: SearchCriteria, dest_path: str) -> str | None:
+        spec = specs.get(source)
+        if not spec:
+            return None
+        async with slots[source]:
+            if source in buckets:
+                while wait := buckets[source].try_acquire():
+                    await asyncio.sleep(wait)
+            if asyncio.iscoroutinefunction(spec.handler):
+                return await spec.handler(params, dest_path)
+            # Copy the context so the thread sees the shared progress display.
+            context = contextvars.copy_context()
+            return await loop.run_in_executor(
+                executor, context.run, spec.handler, params, dest_path
+            )
+
+    progress = _new_progress()
+    token = _progress.set(progress)
+    try:
+        with progress:
+            return await asyncio.gather(*(run(*job) for job in jobs))
+    finally:
+        _progress.reset(token)
+        executor.shutdown(wait=False)
+
+
+def download_many(jobs: Iterable[tuple[str, SearchCriteria, str]]) -> list[str | None]:
+    """Blocking entry point for `download_many_async`; see there."""
+    return asyncio.run(download_many_async(jobs))
+
+
+def prepare_download(source: str, params: SearchCriteria) -> str | None:
+    """Return the request URL `download_catalog` would fetch, without fetching it."""
+    url = SOURCE_URLS.get(source)
+    if not url:
         logger.error(f"Unknown catalog source: {source}")
         return None
-    return handler(params, dest_path)
+    return requests.Request("GET", url, params=params).prepare().url
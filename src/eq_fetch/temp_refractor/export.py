@@ -4,6 +4,30 @@ from typing import Any
 import pandas as pd
 import dicttoxml
 
+_TIME_COLUMNS = {"origin_time", "time", "datetime"}
+_FLOAT32_COLUMNS = {"lat", "lon", "latitude", "longitude", "dep", "depth", "mag"}
+_CATEGORY_COLUMNS = {"agency", "region", "mag_type", "source"}
+
+
+def _typed_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Give catalog columns compact, typed dtypes for columnar formats.
+
+    Times become datetime64, coordinates, depths and magnitudes float32, and
+    agency, region and magnitude-type columns dictionary-encoded categories.
+    """
+    typed = df.copy()
+    for column in typed.columns:
+        name = str(column).lower()
+        if name in _TIME_COLUMNS:
+            typed[column] = pd.to_datetime(typed[column].astype(str), utc=True)
+        elif name in _FLOAT32_COLUMNS:
+            typed[column] = pd.to_numeric(typed[column], errors="coerce").astype(
+                "float32"
+            )
+        elif name in _CATEGORY_COLUMNS or name.endswith("_agency"):
+            typed[column] = typed[column].astype("category")
+    return typed
+
 
 def export_results(results: Any, fmt: str, filename: str) -> None:
     """."""
@@ -28,5 +52,9 @@ def export_results(results: Any, fmt: str, filename: str) -> None:
             xml_bytes = dicttoxml.dicttoxml(df.to_dict(orient="records"))
             with open(filename, "wb") as f:
                 f.write(xml_bytes)
+    elif fmt == "parquet":
+        _typed_frame(df).to_parquet(filename, index=False, compression="zstd")
+    elif fmt == "feather":
+        _typed_frame(df).to_feather(filename, compression="zstd")
     else:
         raise ValueError(f"Unsupported export format: {fmt}")
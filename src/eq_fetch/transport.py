@@ -0,0 +1,198 @@
+"""Shared HTTP transport for every fetcher.
+
+One pooled `requests.Session` is kept per host so connections (and their TLS
+handshakes) are reused, and transient failures are retried with jittered
+exponential backoff. Each host also gets an `AdaptiveLimiter`, so every
+fetcher backs off together when the server pushes back.
+"""
+
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from eq_fetch import metrics
+from eq_fetch.fetcher import AdaptiveLimiter
+
+_USER_AGENT = "eq-fetch/0.1.0"
+_ISC_URL = "https://www.isc.ac.uk"
+_TIMEOUT = 10
+# 429 and 503 mean the server is shedding load; they are retried here rather
+# than by urllib3 so the limiter sees every one.
+_RETRY_STATUSES = (500, 502, 504)
+_BUSY_STATUSES = (429, 503)
+_BUSY_PAGE = b"your request cannot be processed at the present time"
+_MAX_RETRY_AFTER = 300.0
+
+_settings = {"retries": 3, "backoff_factor": 0.5, "pool_size": 16, "concurrency": 16}
+_sessions: dict[str, requests.Session] = {}
+_limiters: dict[str, AdaptiveLimiter] = {}
+_lock = threading.Lock()
+
+
+def isc_url(path: str) -> str:
+    """Return the URL of ISC endpoint `path`.
+
+    Setting `EQ_FETCH_ISC_URL` points every fetcher at a mirror or a local
+    stand-in server instead of www.isc.ac.uk.
+    """
+    base = os.environ.get("EQ_FETCH_ISC_URL") or _ISC_URL
+    return f"{base.rstrip('/')}/{path.lstrip('/')}"
+
+
+def configure(
+    retries: int | None = None,
+    backoff_factor: float | None = None,
+    pool_size: int | None = None,
+    concurrency: int | None = None,
+) -> None:
+    """Change transport settings; sessions are rebuilt on next use.
+
+    `concurrency` is the most requests the limiter lets in flight per host.
+    """
+    with _lock:
+        if retries is not None:
+            _settings["retries"] = retries
+        if backoff_factor is not None:
+            _settings["backoff_factor"] = backoff_factor
+        if pool_size is not None:
+            _settings["pool_size"] = pool_size
+        if concurrency is not None:
+            _settings["concurrency"] = concurrency
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+        _limiters.clear()
+
+
+def _retry_policy() -> Retry:
+    options = dict(
+        total=_settings["retries"],
+        connect=_settings["retries"],
+        read=_settings["retries"],
+        status=_settings["retries"],
+        status_forcelist=_RETRY_STATUSES,
+        backoff_factor=_settings["backoff_factor"],
+        # get() honours Retry-After itself, for the busy statuses only.
+        respect_retry_after_header=False,
+        raise_on_status=False,
+    )
+    try:
+        return Retry(**options, backoff_jitter=_settings["backoff_factor"])
+    except TypeError:  # urllib3 < 2 has no jitter
+        return Retry(**options)
+
+
+def _new_session() -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=_settings["pool_size"],
+        max_retries=_retry_policy(),
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update(
+        {"User-Agent": _USER_AGENT, "Accept-Encoding": "gzip, deflate"}
+    )
+    return session
+
+
+def _host(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def get_session(url: str) -> requests.Session:
+    """Return the shared session for the host of `url`."""
+    host = _host(url)
+    with _lock:
+        session = _sessions.get(host)
+        if session is None:
+            session = _sessions[host] = _new_session()
+    return session
+
+
+def get_limiter(url: str) -> AdaptiveLimiter:
+    """Return the shared concurrency limiter for the host of `url`."""
+    host = _host(url)
+    with _lock:
+        limiter = _limiters.get(host)
+        if limiter is None:
+            limiter = _limiters[host] = AdaptiveLimiter(_settings["concurrency"])
+    return limiter
+
+
+def _busy(response: requests.Response, stream: bool) -> bool:
+    if response.status_code in _BUSY_STATUSES:
+        return True
+    return not stream and _BUSY_PAGE in response.content
+
+
+def _retry_after(response: requests.Response) -> float | None:
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+    return min(max(seconds, 0.0), _MAX_RETRY_AFTER)
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    """`requests.get` through the pooled, retrying session for `url`.
+
+    Requests wait for a slot from the host's `AdaptiveLimiter`. 429 and 503
+    responses and ISC "cannot be processed" pages cut its limit and are
+    retried after their Retry-After, or a jittered exponential backoff, up
+    to the configured retries; the last response is returned as is.
+    Timeouts and dropped connections cut the limit too before they raise.
+    """
+    kwargs.setdefault("timeout", _TIMEOUT)
+    stream = kwargs.get("stream", False)
+    session = get_session(url)
+    limiter = get_limiter(url)
+    attempts = _settings["retries"] + 1
+    for attempt in range(attempts):
+        limiter.acquire()
+        started = time.perf_counter()
+        response = None
+        busy, retry_after = False, None
+        try:
+            response = session.get(url, **kwargs)
+            busy = _busy(response, stream)
+            retry_after = _retry_after(response) if busy else None
+        except (requests.Timeout, requests.ConnectionError):
+            # A server that stops answering is pushing back hardest of all.
+            busy = True
+            raise
+        finally:
+            latency = response.elapsed.total_seconds() if response is not None else None
+            if limiter.release(latency, busy=busy, retry_after=retry_after):
+                metrics.count("throttled")
+        metrics.observe("http_latency", time.perf_counter() - started)
+        metrics.count("http_requests")
+        retries = getattr(response.raw, "retries", None)
+        if retries is not None and retries.history:
+            metrics.count("http_retries", len(retries.history))
+        if not stream:
+            metrics.count("bytes_downloaded", len(response.content))
+        if not busy or attempt == attempts - 1:
+            return response
+        metrics.count("server_busy")
+        response.close()
+        if retry_after is None:
+            # With a Retry-After the limiter already holds every request back.
+            backoff = _settings["backoff_factor"] * 2**attempt
+            time.sleep(backoff * random.uniform(0.5, 1.5))
+    return response
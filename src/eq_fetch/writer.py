@@ -0,0 +1,257 @@
+"""Streaming writers for bibliography output."""
+
+import csv
+import os
+import time
+from pathlib import Path
+from typing import Callable
+
+
+class StreamingCSVWriter:
+    """Append rows to a CSV file in bounded batches.
+
+    Rows are buffered per event and written once `batch_rows` rows are
+    pending or `flush_interval` seconds have passed. The file is fsynced at
+    most every `fsync_interval` seconds and on close. `on_flush` receives
+    the ids of the events whose rows have just reached the file.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        header: list[str],
+        append: bool = False,
+        batch_rows: int = 500,
+        flush_interval: float = 2.0,
+        fsync_interval: float = 10.0,
+        on_flush: Callable[[list[str]], None] | None = None,
+    ):
+        self.path = Path(path)
+        self.batch_rows = batch_rows
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self.on_flush = on_flush
+        self._rows: list[list[str]] = []
+        self._events: list[str] = []
+        self._file = open(
+            self.path, "a" if append else "w", newline="", encoding="utf-8"
+        )
+        self._writer = csv.writer(self._file)
+        self._last_flush = self._last_sync = time.monotonic()
+        if not append:
+            self._writer.writerow(header)
+
+    def write_event(self, event_id: str, rows: list[list[str]]) -> None:
+        self._rows.extend(rows)
+        self._events.append(event_id)
+        if (
+            len(self._rows) >= self.batch_rows
+            or time.monotonic() - self._last_flush >= self.flush_interval
+        ):
+            self.flush()
+
+    def flush(self, sync: bool = False) -> None:
+        self._writer.writerows(self._rows)
+        self._file.flush()
+        now = time.monotonic()
+        if sync or now - self._last_sync >= self.fsync_interval:
+            os.fsync(self._file.fileno())
+            self._last_sync = now
+        self._last_flush = now
+        events, self._rows, self._events = self._events, [], []
+        if self.on_flush and events:
+            self.on_flush(events)
+
+    def close(self) -> None:
+        if self._file.closed:
+            return
+        try:
+            self.flush(sync=True)
+        finally:
+            self._file.close()
+
+    def __enter__(self) -> "StreamingCSVWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+ARROW_FORMATS = ("parquet", "feather")
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+    except ImportError as e:
+        raise ImportError(
+            "Parquet and Feather output need pyarrow: pip install 'eq-fetch[arrow]'"
+        ) from e
+    return pyarrow
+
+
+class StreamingArrowWriter:
+    """Write rows to a Parquet or Arrow IPC (Feather) file with typed columns.
+
+    Rows arrive as strings, like those given to `StreamingCSVWriter`, and are
+    cast column-wise to `schema` once `batch_rows` are pending. Row groups
+    (record batches for IPC) hold exactly `batch_rows` rows counted from the
+    start of the file, the last one the remainder, so the layout does not
+    depend on how the rows arrived. Neither format is readable before its
+    footer is written, so batches go to a temporary file that replaces
+    `path` on close, and `on_flush` receives the ids of every event written
+    only then. With `append`, the rows of an existing `path` are carried
+    over first; a resumed run thus writes the same bytes as an uninterrupted
+    one. Dictionary columns keep one dictionary that grows across batches,
+    as IPC files cannot replace one.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        schema,
+        fmt: str = "parquet",
+        append: bool = False,
+        batch_rows: int = 65536,
+        on_flush: Callable[[list[str]], None] | None = None,
+    ):
+        if fmt not in ARROW_FORMATS:
+            raise ValueError(f"Unsupported Arrow format: {fmt}")
+        pa = _require_pyarrow()
+        self.path = Path(path)
+        self.schema = schema
+        self.fmt = fmt
+        self.batch_rows = batch_rows
+        self.on_flush = on_flush
+        self._rows: list[list[str]] = []
+        self._events: list[str] = []
+        self._codes: dict[str, dict[str, int]] = {}
+        # Cast rows not yet written, with dictionary columns still decoded.
+        self._pending = []
+        self._plain = pa.schema(
+            [
+                (
+                    field.with_type(field.type.value_type)
+                    if pa.types.is_dictionary(field.type)
+                    else field
+                )
+                for field in schema
+            ]
+        )
+        self._tmp = self.path.with_name(self.path.name + ".part")
+        if fmt == "parquet":
+            import pyarrow.parquet as pq
+
+            self._writer = pq.ParquetWriter(self._tmp, schema, compression="zstd")
+        else:
+            self._writer = pa.ipc.new_file(
+                str(self._tmp),
+                schema,
+                options=pa.ipc.IpcWriteOptions(
+                    compression="zstd", emit_dictionary_deltas=True
+                ),
+            )
+        self._closed = False
+        if append and self.path.exists():
+            self._carry_over()
+
+    def _carry_over(self) -> None:
+        self.write_table(read_table(self.path, self.fmt))
+
+    def _encode(self, values, field):
+        pa = _require_pyarrow()
+        codes = self._codes.setdefault(field.name, {})
+        indices = [
+            None if value is None else codes.setdefault(value, len(codes))
+            for value in values
+        ]
+        return pa.DictionaryArray.from_arrays(
+            pa.array(indices, type=field.type.index_type),
+            pa.array(list(codes), type=field.type.value_type),
+        )
+
+    def _cast(self, values: tuple, field):
+        pa = _require_pyarrow()
+        column = pa.array(values, type=pa.string())
+        if pa.types.is_timestamp(field.type) and field.type.tz:
+            # Origin times are naive UTC strings; parse, then attach the zone.
+            column = column.cast(pa.timestamp(field.type.unit))
+        return column.cast(field.type)
+
+    def write_event(self, event_id: str, rows: list[list[str]]) -> None:
+        self._rows.extend(rows)
+        self._events.append(event_id)
+        if len(self._rows) >= self.batch_rows:
+            self.flush()
+
+    def flush(self, final: bool = False) -> None:
+        """Cast the pending rows; write every full batch, or all with `final`."""
+        pa = _require_pyarrow()
+        if self._rows:
+            columns = zip(*self._rows)
+            arrays = [
+                self._cast(values, field) for values, field in zip(columns, self._plain)
+            ]
+            self._pending.append(pa.Table.from_arrays(arrays, schema=self._plain))
+            self._rows = []
+        if not self._pending:
+            return
+        pending = pa.concat_tables(self._pending)
+        while pending.num_rows >= self.batch_rows or (final and pending.num_rows):
+            self._write_batch(pending.slice(0, self.batch_rows))
+            pending = pending.slice(self.batch_rows)
+        self._pending = [pending] if pending.num_rows else []
+
+    def _write_batch(self, table) -> None:
+        pa = _require_pyarrow()
+        arrays = [
+            (
+                self._encode(column.to_pylist(), field)
+                if pa.types.is_dictionary(field.type)
+                else column.combine_chunks()
+            )
+            for field, column in zip(self.schema, table.columns)
+        ]
+        self._writer.write_table(pa.Table.from_arrays(arrays, schema=self.schema))
+
+    def write_table(self, table) -> None:
+        """Write an already typed table, such as one read back from a part."""
+        pa = _require_pyarrow()
+        self.flush()
+        arrays = [
+            column.cast(field.type) for field, column in zip(self._plain, table.columns)
+        ]
+        self._pending.append(pa.Table.from_arrays(arrays, schema=self._plain))
+        self.flush()
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self.flush(final=True)
+        finally:
+            self._writer.close()
+        with open(self._tmp, "rb+") as f:
+            os.fsync(f.fileno())
+        os.replace(self._tmp, self.path)
+        events, self._events = self._events, []
+        if self.on_flush and events:
+            self.on_flush(events)
+
+    def __enter__(self) -> "StreamingArrowWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def read_table(path: Path, fmt: str):
+    """Read a Parquet or Arrow IPC file written by `StreamingArrowWriter`."""
+    pa = _require_pyarrow()
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        return pq.read_table(path)
+    with pa.memory_map(str(path)) as source:
+        return pa.ipc.open_file(source).read_all()
@@ -0,0 +1,159 @@
+import csv
+from datetime import timedelta
+from pathlib import Path
+
+import pytest
+
+from eq_fetch import biblio, index, transport
+from eq_fetch.bulk import Window
+from eq_fetch.quarantine import Quarantine
+
+
+def test_schedule_follows_run_order():
+    early = Window(100, 200, ["a", "b", "c"], 3)
+    late = Window(900, 950, ["x", "y"], 2)
+    # Run order by magnitude: windows go where their first event falls.
+    run = ["y", "s1", "b", "x", "s2", "a", "c", "s3"]
+    assert biblio._schedule(run, [early, late]) == [late, "s1", early, "s2", "s3"]
+
+
+def test_schedule_without_windows():
+    assert biblio._schedule(["a", "b"], []) == ["a", "b"]
+
+
+def test_estimate():
+    assert biblio._estimate(0, None, 4) == timedelta(0)
+    # A round of up to `workers` requests takes one assumed latency.
+    assert biblio._estimate(1, None, 4) == timedelta(seconds=1)
+    assert biblio._estimate(100, None, 4) == timedelta(seconds=25)
+    assert biblio._estimate(101, None, 4) == timedelta(seconds=26)
+    # A rate slower than the workers sets the pace.
+    assert biblio._estimate(100, 2.0, 4) == timedelta(seconds=50)
+    assert biblio._estimate(100, 1000.0, 4) == timedelta(seconds=25)
+
+
+_PAGE = (
+    Path(__file__).parents[1] / "benchmarks/fixtures/FormatBibprint/642628767.html"
+).read_text()
+
+
+class _Response:
+    def __init__(self, text):
+        self.status_code = 200
+        self.headers = {}
+        self.text = text
+        self.content = text.encode("utf-8")
+
+    def raise_for_status(self):
+        pass
+
+
+class _Clock:
+    """Stands in for biblio's `time`; each request takes one second."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+
+class _ISC:
+    """FormatBibprint stand-in serving the recorded page for every event."""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.broken = set()
+        self.requested = []
+
+    def get(self, url, **kwargs):
+        event_id = url.rpartition("evid=")[2]
+        self.requested.append(event_id)
+        self.clock.now += 1.0
+        if event_id in self.broken:
+            return _Response("<html><pre>Event not found</pre></html>")
+        return _Response(_PAGE.replace("642628767", event_id))
+
+
+@pytest.fixture
+def isc(tmp_path, monkeypatch):
+    """A 30-event index and a stub ISC, with the run's files under tmp_path."""
+    pytest.importorskip("flinnengdahl")
+    lines = ["ISC_event,Agency,Origin_Time,Lat,Lon,Depth,Mag,N,Event_code"]
+    for n in range(30):
+        lines.append(
+            f"{600000000 + n},ISC,2024-01-{n % 28 + 1:02d}T0{n % 10}:00:00,"
+            f"{n * 5 - 70},{n * 11 - 160},10.0,{4 + n % 5 * 0.5},{n % 7 + 1},"
+        )
+    (tmp_path / "events.csv").write_text("\n".join(lines) + "\n")
+    index.ingest([tmp_path / "events.csv"], tmp_path / "index.db")
+    monkeypatch.setattr(biblio, "_DB_PATH", tmp_path / "index.db")
+    monkeypatch.chdir(tmp_path)
+    clock = _Clock()
+    monkeypatch.setattr(biblio, "time", clock)
+    server = _ISC(clock)
+    monkeypatch.setattr(transport, "get", server.get)
+    return server
+
+
+def _run(*args):
+    biblio.main(
+        ["--start-time", "20240101", "--no-bulk", "--no-cache", "--workers", "1"]
+        + list(args),
+        standalone_mode=False,
+    )
+
+
+@pytest.mark.parametrize("suffix", ["csv", "parquet", "feather"])
+def test_resume_after_time_limit_matches_full_run(isc, suffix):
+    if suffix != "csv":
+        pytest.importorskip("pyarrow")
+    _run("-o", f"full.{suffix}")
+    assert len(isc.requested) == 30
+
+    isc.requested.clear()
+    _run("-o", f"run.{suffix}", "--time-limit", "0.2")
+    stopped = len(isc.requested)
+    assert 12 <= stopped < 30
+    _run("-o", f"run.{suffix}", "--resume")
+    # Besides the fetch-ahead window, only unfinished events are fetched again.
+    assert len(set(isc.requested)) == 30
+    assert len(isc.requested) <= 30 + 2
+    assert Path(f"run.{suffix}").read_bytes() == Path(f"full.{suffix}").read_bytes()
+
+
+def _rows(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return sorted(csv.reader(f))
+
+
+def test_reprocess_quarantine(isc, monkeypatch):
+    isc.broken = {"600000004", "600000017"}
+    _run("-o", "full.csv")
+
+    # An older parser that cannot read one of the pages.
+    parse = biblio._parse_bulletin
+
+    def old_parse(text):
+        if "Event 600000009" in text:
+            raise biblio.BulletinFormatError("unknown layout")
+        return parse(text)
+
+    monkeypatch.setattr(biblio, "_parse_bulletin", old_parse)
+    _run("-o", "out.csv")
+    quarantine = Quarantine()
+    assert [record["evid"] for record, _ in quarantine.records()] == [
+        "600000004",
+        "600000009",
+        "600000017",
+    ]
+    assert _rows("out.csv") != _rows("full.csv")
+
+    monkeypatch.setattr(biblio, "_parse_bulletin", parse)
+    requested = len(isc.requested)
+    _run("--reprocess-quarantine")
+    assert len(isc.requested) == requested
+    assert _rows("out.csv") == _rows("full.csv")
+    kept = list(quarantine.records())
+    assert [record["evid"] for record, _ in kept] == ["600000004", "600000017"]
+    assert all(record["attempts"] == 1 for record, _ in kept)
@@ -0,0 +1,106 @@
+import random
+from pathlib import Path
+
+import pytest
+
+from eq_fetch import bulk
+
+FIXTURES = Path(__file__).parent.parent / "benchmarks" / "fixtures"
+
+
+@pytest.fixture(scope="module")
+def page():
+    return (FIXTURES / "bibsearch" / "2024-01.html").read_text(encoding="utf-8")
+
+
+def test_parse_page(page):
+    events = bulk.parse_page(page)
+    assert len(events) == 10
+    assert list(events) == sorted(events)
+    assert len(events["636373818"]) == 1
+    assert len(events["636373819"]) == 112
+    for evid, entries in events.items():
+        assert entries
+        assert all(f"event {evid} part" in entry for entry in entries)
+
+
+def test_parse_page_overflow():
+    html = (
+        "<html><body><p>Your search was limited to 500 seismic events."
+        " Please narrow it.</p></body></html>"
+    )
+    assert bulk.parse_page(html) is None
+
+
+def test_parse_page_without_events():
+    html = "<html><body><p>Found 0 events with references.</p></body></html>"
+    assert bulk.parse_page(html) == {}
+
+
+def test_parse_page_truncated(page):
+    # fetch_window leaves a window whose page cannot be parsed to the
+    # per-event endpoint, on the errors raised here.
+    cut = page.index(" ISC event") + len(" ISC event")
+    with pytest.raises((ValueError, IndexError)):
+        bulk.parse_page(page[:cut])
+
+
+def _check_plan(needed, times, cap, windows, stragglers):
+    # Every needed event lands in exactly one window or among the stragglers,
+    # and every window's page fits under the cap.
+    planned = [evid for window in windows for evid in window.events] + stragglers
+    assert sorted(planned) == sorted(evid for evid, _ in needed)
+    origin = dict(needed)
+    for window in windows:
+        listed = sum(window.start <= t <= window.end for t in times)
+        assert window.size == listed <= cap
+        assert len(window.events) >= 2
+        assert all(window.start <= origin[evid] <= window.end for evid in window.events)
+    for earlier, later in zip(windows, windows[1:]):
+        assert earlier.end <= later.start
+
+
+def test_plan_windows_dense():
+    times = list(range(1000, 1100))
+    needed = [(str(t), t + 0.5) for t in times[::2]]
+    windows, stragglers = bulk.plan_windows(needed, times)
+    assert windows == [bulk.Window(1000, 1099, [evid for evid, _ in needed], 100)]
+    assert stragglers == []
+
+
+def test_plan_windows_splits_at_cap():
+    times = list(range(0, 1200))
+    needed = [(str(t), float(t)) for t in times]
+    windows, stragglers = bulk.plan_windows(needed, times, cap=500)
+    assert [window.size for window in windows] == [500, 500, 200]
+    assert stragglers == []
+    _check_plan(needed, times, 500, windows, stragglers)
+
+
+def test_plan_windows_leaves_sparse_events():
+    # Two needed events among 1000 referenced ones would waste the page.
+    times = list(range(0, 1000))
+    needed = [("a", 10.0), ("b", 900.0), ("c", 2000.0)]
+    windows, stragglers = bulk.plan_windows(needed, times + [2000])
+    assert windows == []
+    assert stragglers == ["a", "b", "c"]
+
+
+def test_plan_windows_random():
+    rng = random.Random(7)
+    times = sorted(rng.randrange(100_000) for _ in range(3000))
+    needed = [
+        (str(n), t + rng.random()) for n, t in enumerate(times) if rng.random() < 0.3
+    ]
+    rng.shuffle(needed)
+    windows, stragglers = bulk.plan_windows(needed, times, cap=200)
+    assert windows
+    _check_plan(needed, times, 200, windows, stragglers)
+
+
+def test_window_url():
+    window = bulk.Window(1704067200, 1704153599, ["1", "2"], 2)
+    url = bulk.window_url(window)
+    assert "cgi-bin/bibsearch.pl?searchshape=GLOBAL" in url
+    assert "&start_year=2024&start_month=1&start_day=1&stime=00%3A00%3A00" in url
+    assert "&end_year=2024&end_month=1&end_day=1&etime=23%3A59%3A59" in url
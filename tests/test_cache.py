@@ -0,0 +1,185 @@
+import json
+import sqlite3
+
+import pytest
+
+from eq_fetch import cache as cache_module
+from eq_fetch.cache import BibliographyCache
+
+DAY = 86400.0
+
+SEISMO = (
+    "Ekström, G. and Bondár, I. (2002). Source parameters of the Denali"
+    " earthquake, Bull. Seismol. Soc. Am., 92(4), 824-1524."
+    " DOI: 10.1785/0120010123"
+)
+TECTONO = (
+    'Harris, R. and Di Giacomo, D. (2010). The "Tohoku" rupture,'
+    " Tectonophysics, 49(2), 11-20. DOI: 10.1016/J.TECTO.2010.01.002"
+)
+JGR = (
+    "Villaseñor, A. (1974). Seismol. Soc. Am. meets Bull, J. Geophys. Res.,"
+    " 32(4), 249-514."
+)
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(cache_module, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def store(tmp_path, clock):
+    store = BibliographyCache(tmp_path / "cache.db", ttl_days=1, max_bytes=None)
+    yield store
+    store.close()
+
+
+def _publications(store):
+    return {entry for (entry,) in store._conn.execute("SELECT entry FROM publications")}
+
+
+def test_round_trip(store):
+    assert store.get("1") is None
+    store.put("1", [TECTONO, SEISMO, TECTONO])
+    store.put("2", [])
+    assert store.get("1") == [TECTONO, SEISMO, TECTONO]
+    assert store.get("2") == []
+    assert store.cached(["1", "2", "3"]) == {"1", "2"}
+    assert _publications(store) == {TECTONO, SEISMO}
+
+
+def test_replacing_entries_drops_orphans(store):
+    store.put("1", [SEISMO, TECTONO])
+    store.put("2", [TECTONO])
+    store.put("1", [JGR])
+    assert store.get("1") == [JGR]
+    assert store.get("2") == [TECTONO]
+    assert _publications(store) == {TECTONO, JGR}
+    assert store.matching("1", journal="Bull. Seismol.") == []
+
+
+def test_ttl(store, clock):
+    store.put("1", [SEISMO])
+    clock.now += 0.5 * DAY
+    store.put("2", [TECTONO])
+    clock.now += 0.6 * DAY
+    assert store.get("1") is None
+    assert store.get("2") == [TECTONO]
+    assert store.cached(["1", "2"]) == {"2"}
+    assert store.matching("1") == []
+    assert store.matching("2") == [TECTONO]
+    # Fetching again makes the entries fresh.
+    store.put("1", [SEISMO])
+    assert store.get("1") == [SEISMO]
+
+
+def test_no_ttl(tmp_path, clock):
+    store = BibliographyCache(tmp_path / "cache.db", ttl_days=None, max_bytes=None)
+    store.put("1", [SEISMO])
+    clock.now += 10_000 * DAY
+    assert store.get("1") == [SEISMO]
+    store.close()
+
+
+def _size(*entries):
+    return sum(len(entry.encode("utf-8")) for entry in entries)
+
+
+def test_lru_eviction(tmp_path, clock):
+    limit = _size(SEISMO, TECTONO, JGR)
+    store = BibliographyCache(tmp_path / "cache.db", ttl_days=None, max_bytes=limit)
+    store.put("1", [SEISMO])
+    clock.now += 1
+    store.put("2", [TECTONO, JGR])
+    clock.now += 1
+    store.put("3", [TECTONO])
+    assert store.cached(["1", "2", "3"]) == {"2", "3"}
+    assert _publications(store) == {TECTONO, JGR}
+
+    # Reading an event makes it the most recently used.
+    clock.now += 1
+    assert store.get("2") == [TECTONO, JGR]
+    clock.now += 1
+    store.put("4", [SEISMO])
+    assert store.cached(["1", "2", "3", "4"]) == {"2", "4"}
+    # TECTONO is still cited by event 2; only SEISMO came back.
+    assert _publications(store) == {TECTONO, JGR, SEISMO}
+    assert store.matching("4", author="Ekström") == [SEISMO]
+    store.close()
+
+    reopened = BibliographyCache(tmp_path / "cache.db", ttl_days=None, max_bytes=limit)
+    assert reopened._size == _size(TECTONO, JGR, SEISMO)
+    reopened.close()
+
+
+def test_upgrade_legacy_table(tmp_path, clock):
+    path = tmp_path / "cache.db"
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE bibliographies (evid INTEGER PRIMARY KEY, entries TEXT NOT NULL,"
+        " size INTEGER NOT NULL, fetched_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+    )
+    conn.executemany(
+        "INSERT INTO bibliographies VALUES (?, ?, ?, ?, ?)",
+        [
+            (1, json.dumps([SEISMO, TECTONO]), 0, clock.now, clock.now),
+            (2, json.dumps([TECTONO]), 0, clock.now - 2 * DAY, clock.now),
+        ],
+    )
+    conn.commit()
+    conn.close()
+
+    store = BibliographyCache(path, ttl_days=1, max_bytes=None)
+    assert store.get("1") == [SEISMO, TECTONO]
+    # Upgraded entries keep their fetch time, so stale ones stay stale.
+    assert store.get("2") is None
+    assert store.matching("1", doi="10.1785") == [SEISMO]
+    tables = {name for (name,) in store._conn.execute("SELECT name FROM sqlite_master")}
+    assert "bibliographies" not in tables
+    assert store._conn.execute("PRAGMA user_version").fetchone()[0] == 1
+    store.close()
+
+    reopened = BibliographyCache(path, ttl_days=None, max_bytes=None)
+    assert reopened.get("2") == [TECTONO]
+    reopened.close()
+
+
+@pytest.mark.parametrize(
+    "predicates, expected",
+    [
+        ({}, [SEISMO, TECTONO, JGR]),
+        # A phrase: JGR has the same words, but not in this order.
+        ({"journal": "Bull. Seismol. Soc. Am."}, [SEISMO]),
+        ({"journal": "bull seismol soc am"}, [SEISMO]),
+        ({"journal": "Seismol. Soc. Am."}, [SEISMO, JGR]),
+        ({"journal": "Soc. Am., 92"}, [SEISMO]),
+        ({"journal": "Tectonophysics"}, [TECTONO]),
+        ({"journal": '"Tohoku" rupture'}, [TECTONO]),
+        ({"journal": 'AND OR NOT "'}, []),
+        ({"author": "ekstrom"}, [SEISMO]),
+        ({"author": "Villasenor"}, [JGR]),
+        ({"author": "Bull"}, []),
+        ({"author": "Di Giacomo"}, [TECTONO]),
+        ({"doi": "10.1016/j.tecto"}, [TECTONO]),
+        ({"doi": "10.1785/0120010123"}, [SEISMO]),
+        ({"doi": "0120010123"}, []),
+        ({"doi": "10."}, [SEISMO, TECTONO]),
+        ({"journal": "Soc. Am.", "doi": "10.1785"}, [SEISMO]),
+        ({"journal": "Soc. Am.", "author": "Villaseñor"}, [JGR]),
+        ({"journal": "Tectonophysics", "author": "Ekström"}, []),
+    ],
+)
+def test_matching(store, predicates, expected):
+    store.put("1", [SEISMO, TECTONO, JGR])
+    assert store.matching("1", **predicates) == expected
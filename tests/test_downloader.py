@@ -0,0 +1,304 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+import requests
+
+from eq_fetch import transport
+from eq_fetch.temp_refractor import downloader
+
+BODY = bytes(range(256)) * 40
+ETAG = '"v1"'
+URL = "http://catalog.invalid/search"
+
+
+class _Response:
+    """Streaming response stand-in; `drop_after` closes the body early."""
+
+    def __init__(self, status_code, headers, body=b"", drop_after=None):
+        self.status_code = status_code
+        self.headers = headers
+        self.url = URL
+        self._body = body
+        self._drop_after = drop_after
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} error", response=self)
+
+    def iter_content(self, chunk_size):
+        body = self._body[: self._drop_after]
+        for start in range(0, len(body), 1000):
+            yield body[start : start + 1000]
+        if self._drop_after is not None:
+            raise requests.exceptions.ChunkedEncodingError("connection reset")
+
+
+class _Server:
+    """Serves BODY with Range/If-Range support, or scripted responses first."""
+
+    def __init__(self, *script, body=BODY, etag=ETAG):
+        self.script = list(script)
+        self.body = body
+        self.etag = etag
+        self.requests = []
+
+    def get(self, url, params=None, headers=None, stream=False):
+        assert stream and headers["Accept-Encoding"] == "identity"
+        self.requests.append(headers)
+        if self.script:
+            return self.script.pop(0)(self, headers)
+        return self.respond(headers)
+
+    def respond(self, headers, drop_after=None):
+        size = len(self.body)
+        if "Range" in headers and headers.get("If-Range") == self.etag:
+            start = int(headers["Range"][len("bytes=") : -1])
+            if start >= size:
+                return _Response(416, {"Content-Range": f"bytes */{size}"})
+            return _Response(
+                206,
+                {
+                    "Content-Range": f"bytes {start}-{size - 1}/{size}",
+                    "Content-Length": str(size - start),
+                },
+                self.body[start:],
+                drop_after,
+            )
+        return _Response(
+            200,
+            {"ETag": self.etag, "Content-Length": str(size)},
+            self.body,
+            drop_after,
+        )
+
+
+def _drop(after):
+    return lambda server, headers: server.respond(headers, drop_after=after)
+
+
+@pytest.fixture
+def paths(tmp_path):
+    return downloader._part_paths(str(tmp_path / "out" / "catalog.csv"))
+
+
+def _download(monkeypatch, server, paths):
+    monkeypatch.setattr(transport, "get", server.get)
+    return downloader._stream_download(URL, {}, str(paths[0]), "test")
+
+
+def _leave_part(paths, data, validator=ETAG):
+    _, part, meta = paths
+    part.parent.mkdir(parents=True, exist_ok=True)
+    part.write_bytes(data)
+    meta.write_text(json.dumps({"url": URL, "validator": validator}))
+
+
+def test_fresh_download(monkeypatch, paths):
+    dest, part, meta = paths
+    server = _Server()
+    assert _download(monkeypatch, server, paths) == str(dest)
+    assert dest.read_bytes() == BODY
+    assert not part.exists() and not meta.exists()
+    assert "Range" not in server.requests[0]
+
+
+def test_resume_after_dropped_connection(monkeypatch, paths):
+    dest, _, _ = paths
+    server = _Server(_drop(3000), _drop(6000))
+    _download(monkeypatch, server, paths)
+    assert dest.read_bytes() == BODY
+    assert [headers.get("Range") for headers in server.requests] == [
+        None,
+        "bytes=3000-",
+        "bytes=9000-",
+    ]
+    assert all(headers["If-Range"] == ETAG for headers in server.requests[1:])
+
+
+def test_resume_part_from_earlier_call(monkeypatch, paths):
+    dest, _, _ = paths
+    _leave_part(paths, BODY[:5000])
+    server = _Server()
+    _download(monkeypatch, server, paths)
+    assert dest.read_bytes() == BODY
+    assert server.requests[0]["Range"] == "bytes=5000-"
+
+
+def test_changed_resource_restarts(monkeypatch, paths):
+    dest, _, _ = paths
+    _leave_part(paths, b"stale" * 100, validator='"v0"')
+    server = _Server()
+    _download(monkeypatch, server, paths)
+    # If-Range no longer matches, so the server sends the whole new body.
+    assert server.requests[0]["If-Range"] == '"v0"'
+    assert dest.read_bytes() == BODY
+
+
+def test_part_without_validator_restarts(monkeypatch, paths):
+    dest, _, _ = paths
+    _leave_part(paths, BODY[:5000], validator=None)
+    server = _Server()
+    _download(monkeypatch, server, paths)
+    assert "Range" not in server.requests[0]
+    assert dest.read_bytes() == BODY
+
+
+def test_wrong_offset_restarts(monkeypatch, paths):
+    dest, _, _ = paths
+    _leave_part(paths, BODY[:5000])
+
+    def from_zero(server, headers):
+        size = len(server.body)
+        return _Response(
+            206, {"Content-Range": f"bytes 0-{size - 1}/{size}"}, server.body
+        )
+
+    server = _Server(from_zero)
+    _download(monkeypatch, server, paths)
+    assert [headers.get("Range") for headers in server.requests] == [
+        "bytes=5000-",
+        None,
+    ]
+    assert dest.read_bytes() == BODY
+
+
+def test_complete_part_finishes_on_416(monkeypatch, paths):
+    dest, part, meta = paths
+    _leave_part(paths, BODY)
+    server = _Server()
+    _download(monkeypatch, server, paths)
+    assert len(server.requests) == 1
+    assert dest.read_bytes() == BODY
+    assert not part.exists() and not meta.exists()
+
+
+def test_416_for_other_length_restarts(monkeypatch, paths):
+    dest, _, _ = paths
+    _leave_part(paths, BODY + b"extra")
+    server = _Server()
+    _download(monkeypatch, server, paths)
+    assert [headers.get("Range") for headers in server.requests] == [
+        f"bytes={len(BODY) + 5}-",
+        None,
+    ]
+    assert dest.read_bytes() == BODY
+
+
+def test_dest_appears_only_when_complete(monkeypatch, paths):
+    dest, part, _ = paths
+    dest.parent.mkdir(parents=True)
+    dest.write_bytes(b"previous download")
+
+    def check(server, headers):
+        # The earlier file stays intact while the new body streams in.
+        assert dest.read_bytes() == b"previous download"
+        return server.respond(headers, drop_after=4000)
+
+    monkeypatch.setattr(downloader, "_RESUME_ATTEMPTS", 2)
+    server = _Server(check, check, check)
+    with pytest.raises(requests.exceptions.ChunkedEncodingError):
+        _download(monkeypatch, server, paths)
+    assert dest.read_bytes() == b"previous download"
+    # The part is kept for the next call to resume.
+    assert part.read_bytes() == BODY[:12000]
+
+    _download(monkeypatch, server, paths)
+    assert dest.read_bytes() == BODY
+    assert not part.exists()
+
+
+def test_endless_restarts_raise(monkeypatch, paths):
+    dest, part, _ = paths
+
+    def past_the_end(server, headers):
+        part.write_bytes(b"x" * 100)
+        return _Response(416, {"Content-Range": f"bytes */{len(server.body)}"})
+
+    monkeypatch.setattr(downloader, "_RESUME_ATTEMPTS", 2)
+    server = _Server(*[past_the_end] * 3)
+    with pytest.raises(requests.exceptions.RequestException, match="restarted 3"):
+        _download(monkeypatch, server, paths)
+    assert not dest.exists()
+
+
+class _Source:
+    """Handler that records how many of its downloads overlap, and when each starts."""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.active = 0
+        self.peak = 0
+        self.starts = []
+
+    def __call__(self, params, dest_path):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+            self.starts.append(time.monotonic())
+        time.sleep(self.delay * params["cost"])
+        with self.lock:
+            self.active -= 1
+        return dest_path
+
+
+def test_download_many_keeps_job_order(monkeypatch):
+    slow, fast = _Source(0.05), _Source(0.01)
+
+    async def coroutine(params, dest_path):
+        await asyncio.sleep(0.01)
+        return dest_path
+
+    monkeypatch.setattr(
+        downloader,
+        "CATALOG_SOURCES",
+        {
+            "slow": downloader.SourceSpec(slow, concurrency=4),
+            "fast": downloader.SourceSpec(fast, concurrency=4),
+            "async": downloader.SourceSpec(coroutine),
+        },
+    )
+    jobs = [
+        ("slow", {"cost": 3}, "a"),
+        ("fast", {"cost": 1}, "b"),
+        ("missing", {}, "c"),
+        ("async", {}, "d"),
+        ("slow", {"cost": 1}, "e"),
+        ("fast", {"cost": 2}, "f"),
+    ]
+    assert downloader.download_many(jobs) == ["a", "b", None, "d", "e", "f"]
+
+
+def test_download_many_limits_each_source(monkeypatch):
+    narrow, wide, paced = _Source(0.05), _Source(0.05), _Source(0.0)
+    monkeypatch.setattr(
+        downloader,
+        "CATALOG_SOURCES",
+        {
+            "narrow": downloader.SourceSpec(narrow, concurrency=2),
+            "wide": downloader.SourceSpec(wide, concurrency=4),
+            "paced": downloader.SourceSpec(paced, concurrency=4, rate=20.0),
+        },
+    )
+    jobs = [
+        (source, {"cost": 1}, f"{source}-{n}")
+        for n in range(8)
+        for source in ("narrow", "wide", "paced")
+    ]
+    started = time.monotonic()
+    downloader.download_many(jobs)
+    assert narrow.peak == 2
+    assert wide.peak == 4
+    # One token up front, then one every 1/20 s.
+    assert paced.starts[-1] - started >= 7 / 20 * 0.9
+    gaps = [b - a for a, b in zip(paced.starts, paced.starts[1:])]
+    assert min(gaps) >= 1 / 20 * 0.8
@@ -0,0 +1,126 @@
+import threading
+import time
+
+import pytest
+import requests
+
+from eq_fetch import transport
+from eq_fetch.fetcher import AdaptiveLimiter
+
+
+def _request(limiter, latency=0.1, **kwargs):
+    limiter.acquire()
+    return limiter.release(latency, **kwargs)
+
+
+def test_bounds():
+    with pytest.raises(ValueError):
+        AdaptiveLimiter(maximum=2, minimum=3)
+    with pytest.raises(ValueError):
+        AdaptiveLimiter(maximum=2, minimum=0)
+
+
+def test_slow_start_doubles_then_caps():
+    limiter = AdaptiveLimiter(maximum=8)
+    assert limiter.limit == 1
+    for expected in (2, 3, 4, 5, 6, 7, 8, 8):
+        assert not _request(limiter)
+        assert limiter.limit == expected
+
+
+def test_busy_cuts_once_per_baseline():
+    limiter = AdaptiveLimiter(maximum=16)
+    for _ in range(7):
+        _request(limiter, latency=60.0)
+    assert limiter.limit == 8
+    assert _request(limiter, busy=True)
+    assert limiter.limit == 4
+    # A second busy response within one baseline latency is the same burst.
+    assert not _request(limiter, busy=True)
+    assert limiter.limit == 4
+
+
+def test_decrease_stops_at_minimum():
+    limiter = AdaptiveLimiter(maximum=16, minimum=2)
+    for _ in range(6):
+        _request(limiter, latency=0.0)
+    assert limiter.limit == 8
+    # With a zero baseline latency every busy response counts.
+    for expected in (4, 2, 2):
+        assert _request(limiter, latency=None, busy=True)
+        assert limiter.limit == expected
+    # Failures before a response carry no latency and raise nothing.
+    _request(limiter, latency=None)
+    assert limiter.limit == 2
+
+
+def test_additive_increase_after_cut():
+    limiter = AdaptiveLimiter(maximum=100)
+    for _ in range(9):
+        _request(limiter, latency=0.0)
+    assert limiter.limit == 10
+    assert _request(limiter, latency=0.0, busy=True)
+    assert limiter.limit == 5
+    # About one more request in flight per round trip, not double.
+    for _ in range(5):
+        _request(limiter, latency=0.0)
+    assert 5.9 < limiter.limit < 6.0
+    for _ in range(60):
+        _request(limiter, latency=0.0)
+    assert 10 < limiter.limit < 13
+
+
+def test_latency_spike_cuts_after_warmup():
+    limiter = AdaptiveLimiter(maximum=64, warmup=5)
+    for _ in range(4):
+        _request(limiter, latency=0.001)
+    assert not _request(limiter, latency=1.0)
+    for _ in range(20):
+        _request(limiter, latency=0.001)
+    before = limiter.limit
+    assert _request(limiter, latency=1.0)
+    assert limiter.limit == before / 2
+
+
+def test_acquire_waits_for_a_slot():
+    limiter = AdaptiveLimiter(maximum=4)
+    limiter.acquire()
+    acquired = threading.Event()
+    waiter = threading.Thread(target=lambda: (limiter.acquire(), acquired.set()))
+    waiter.start()
+    assert not acquired.wait(0.1)
+    limiter.release(0.01)
+    assert acquired.wait(1.0)
+    waiter.join()
+
+
+def test_retry_after_pauses_new_requests():
+    limiter = AdaptiveLimiter(maximum=4)
+    _request(limiter, busy=True, retry_after=0.2)
+    started = time.monotonic()
+    limiter.acquire()
+    assert time.monotonic() - started >= 0.15
+
+
+class _DeadServer:
+    """Session stand-in whose every request fails before a response."""
+
+    def __init__(self, error):
+        self.error = error
+
+    def get(self, url, **kwargs):
+        raise self.error
+
+
+@pytest.mark.parametrize(
+    "error",
+    [requests.ReadTimeout(), requests.ConnectTimeout(), requests.ConnectionError()],
+)
+def test_unanswered_requests_cut_the_limit(monkeypatch, error):
+    url = f"http://{type(error).__name__.lower()}.invalid/page"
+    monkeypatch.setattr(transport, "get_session", lambda url: _DeadServer(error))
+    limiter = transport.get_limiter(url)
+    limiter.limit = 8.0
+    with pytest.raises(type(error)):
+        transport.get(url)
+    assert limiter.limit == 4
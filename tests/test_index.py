@@ -0,0 +1,209 @@
+import calendar
+import random
+import time
+
+import pytest
+from obspy.core.utcdatetime import UTCDateTime
+
+from eq_fetch import BibliographyCriteria
+from eq_fetch import index
+
+
+@pytest.mark.parametrize(
+    "lons, ranges",
+    [
+        ([10.0, 20.0], [(10.0, 20.0)]),
+        ([-180.0, 180.0], []),
+        ([0.0, 0.0], [(0.0, 0.0)]),
+        ([170.0, -170.0], [(170.0, 180.0), (-180.0, -170.0)]),
+        ([190.0, 200.0], [(-170.0, -160.0)]),
+        ([-190.0, -170.0], [(170.0, 180.0), (-180.0, -170.0)]),
+        ([-10.0, -20.0], [(-10.0, 180.0), (-180.0, -20.0)]),
+    ],
+)
+def test_lon_ranges(lons, ranges):
+    assert index.lon_ranges(lons) == ranges
+
+
+def _in_lons(lon, west, east):
+    span = east - west if east >= west else east - west + 360.0
+    return span >= 360.0 or (lon - west) % 360.0 <= span
+
+
+@pytest.fixture(scope="module")
+def event_index(tmp_path_factory):
+    """A small index of random events, with the rows it was built from."""
+    rng = random.Random(20240101)
+    rows = []
+    for evid in range(1, 2001):
+        rows.append(
+            (
+                evid,
+                1_600_000_000 + rng.randrange(100_000_000),
+                round(rng.uniform(-90, 90), 3),
+                round(rng.uniform(-180, 180), 3),
+                round(rng.uniform(0, 700), 1),
+                round(rng.uniform(2, 8), 1),
+                rng.choice([None, 0, 1, 5]),
+            )
+        )
+    directory = tmp_path_factory.mktemp("index")
+    catalogue = directory / "events.csv"
+    lines = ["ISC_event,Agency,Origin_Time,Lat,Lon,Depth,Mag,N,Event_code"]
+    for evid, origin, lat, lon, depth, mag, n in rows:
+        when = UTCDateTime(origin).strftime("%Y-%m-%dT%H:%M:%S")
+        n = "" if n is None else n
+        lines.append(f"{evid},ISC,{when},{lat},{lon},{depth},{mag},{n},")
+    catalogue.write_text("\n".join(lines) + "\n")
+    db = directory / "event_index.db"
+    assert index.ingest([catalogue], db) == (len(rows), len(rows))
+    conn = index.connect(db)
+    yield conn, rows
+    conn.close()
+
+
+@pytest.mark.parametrize(
+    "lats, lons, deps, mags",
+    [
+        (None, None, None, None),
+        ([30.0, 50.0], None, None, [5.0, 6.0]),
+        (None, [10.0, 60.0], None, None),
+        (None, [170.0, -170.0], None, None),
+        ([-60.0, 10.0], [150.0, -150.0], [0.0, 70.0], None),
+        (None, [-190.0, -100.0], [100.0, 300.0], None),
+        ([0.0, 0.0], None, None, None),
+    ],
+)
+@pytest.mark.parametrize("skip_unreferenced", [False, True])
+def test_event_query_matches_brute_force(
+    event_index, lats, lons, deps, mags, skip_unreferenced
+):
+    conn, rows = event_index
+    criteria = BibliographyCriteria()
+    criteria.start_time = UTCDateTime(1_620_000_000)
+    criteria.end_time = UTCDateTime(1_680_000_000)
+    for name, value in (("lats", lats), ("lons", lons), ("deps", deps)):
+        if value is not None:
+            setattr(criteria, name, value)
+    if mags is not None:
+        criteria.mags = mags
+
+    query, params = index.build_event_query(
+        criteria, skip_unreferenced=skip_unreferenced
+    )
+    found = [row[0] for row in conn.execute(query, params)]
+
+    expected = [
+        evid
+        for evid, origin, lat, lon, depth, mag, n in sorted(
+            rows, key=lambda row: (row[1], row[0]), reverse=True
+        )
+        if criteria.start_time.timestamp <= origin <= criteria.end_time.timestamp
+        and min(criteria.lats) <= lat <= max(criteria.lats)
+        and _in_lons(lon, *criteria.lons)
+        and min(criteria.deps) <= depth <= max(criteria.deps)
+        and min(criteria.mags) <= mag <= max(criteria.mags)
+        and not (skip_unreferenced and n == 0)
+    ]
+    assert found == expected
+    if lats or lons or deps:
+        assert any(
+            "isc_events_rtree" in step for step in index.query_plan(conn, query, params)
+        )
+
+
+def _epoch(text):
+    return calendar.timegm(time.strptime(text, "%Y-%m-%d %H:%M:%S"))
+
+
+ISF = """\
+DATA_TYPE BULLETIN IMS1.0:short
+ISC Bulletin
+Event 625187021 Near west coast of eastern Honshu
+   Date       Time        Err   RMS Latitude Longitude  Smaj  Smin  Az Depth   Err Ndef Nsta Gap  mdist  Mdist Qual   Author      OrigID
+2024/01/01 07:10:09.42   0.20  0.60  37.4880  137.2660                  10.0                                          JMA       12345678
+2024/01/01 07:10:09.60   0.20  0.60  37.4960  137.2420                  12.3                                          ISC       12345678
+ (#PRIME)
+2024/01/01 07:10:11.00   0.20  0.60  37.5000  137.3000                  15.0                                          NEIC      12345678
+
+Magnitude  Err Nsta Author      OrigID
+mb     5.9 0.1  80 ISC       12345678
+Mw     7.5       1 GCMT      12345678
+
+Event 625187022 Tonga Islands
+   Date       Time        Err   RMS Latitude Longitude  Smaj  Smin  Az Depth   Err Ndef Nsta Gap  mdist  Mdist Qual   Author      OrigID
+2023/12/31 23:59:59.99   0.20  0.60 -20.1000 -175.5000                                                                NEIC      12345678
+2023/12/31 23:59:58.10   0.20  0.60 -20.2000 -175.4000                  33.0                                          GFZ       12345678
+
+Event 625187023 No origins
+STOP
+"""
+
+
+def test_read_isf(tmp_path):
+    path = tmp_path / "bulletin.isf"
+    path.write_text(ISF)
+    assert list(index.read_catalogue(path)) == [
+        (
+            625187021,
+            "ISC",
+            _epoch("2024-01-01 07:10:09"),
+            37.496,
+            137.242,
+            12.3,
+            7.5,
+            None,
+            None,
+        ),
+        (
+            625187022,
+            "GFZ",
+            _epoch("2023-12-31 23:59:58"),
+            -20.2,
+            -175.4,
+            33.0,
+            None,
+            None,
+            None,
+        ),
+    ]
+
+
+def test_read_isc_csv(tmp_path):
+    path = tmp_path / "catalogue.csv"
+    path.write_text(
+        "--EVENT--|--------------ISC HYPOCENTRE--------------|\n"
+        "  EVENTID,TYPE,AUTHOR,DATE,TIME,LAT,LON,DEPTH,DEPFIX,AUTHOR,TYPE,MAG\n"
+        "625187021,LE,ISC,2024-01-01,07:10:09.60,37.4960,137.2420,12.3,TRUE,"
+        "ISC,mb,5.9,GCMT,Mw,7.5\n"
+        "625187022,LE,ISC,2023-12-31,23:59:58.10,-20.2000,-175.4000,,FALSE,,,\n"
+    )
+    assert list(index.read_catalogue(path)) == [
+        (625187021, "ISC", _epoch("2024-01-01 07:10:09"), 37.496, 137.242)
+        + (12.3, 7.5, None, None),
+        (625187022, "ISC", _epoch("2023-12-31 23:59:58"), -20.2, -175.4)
+        + (None, None, None, None),
+    ]
+
+
+def test_read_index_csv(tmp_path):
+    path = tmp_path / "index.csv"
+    path.write_text(
+        "ISC_event,Agency,Origin_Time,Lat,Lon,Depth,Mag,N,Event_code\n"
+        "625187021,ISC,2024-01-01T07:10:09.6Z,37.496,137.242,12.3,7.5,12,ke\n"
+        ",ISC,2024-01-01T00:00:00,,,,,,\n"
+        "625187022.0,,2023-12-31 23:59:58,,,,,,\n"
+    )
+    assert list(index.read_catalogue(path)) == [
+        (625187021, "ISC", _epoch("2024-01-01 07:10:09"), 37.496, 137.242)
+        + (12.3, 7.5, 12, "ke"),
+        (625187022, None, _epoch("2023-12-31 23:59:58"), None, None)
+        + (None, None, None, None),
+    ]
+
+
+def test_read_catalogue_rejects_unknown_format(tmp_path):
+    path = tmp_path / "notes.txt"
+    path.write_text("not a catalogue\n")
+    with pytest.raises(ValueError, match="notes.txt"):
+        list(index.read_catalogue(path))
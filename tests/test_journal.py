@@ -0,0 +1,52 @@
+import pytest
+
+from eq_fetch import BibliographyCriteria
+from eq_fetch.journal import RunJournal, criteria_key
+
+
+@pytest.fixture
+def journal(tmp_path):
+    journal = RunJournal("run", tmp_path / "runs")
+    yield journal
+    journal.close()
+
+
+def test_mark_done_persists(journal, tmp_path):
+    assert journal.completed() == set()
+    journal.mark_done(["600000001", "600000002"])
+    journal.mark_done(["600000002", "600000003"])
+    assert journal.completed() == {600000001, 600000002, 600000003}
+    journal.close()
+
+    reopened = RunJournal("run", tmp_path / "runs")
+    assert reopened.path == tmp_path / "runs" / "run.db"
+    assert reopened.completed() == {600000001, 600000002, 600000003}
+    reopened.close()
+
+
+def test_reset(journal):
+    journal.mark_done(["1", "2"])
+    journal.reset()
+    assert journal.completed() == set()
+
+
+def test_runs_are_separate(journal, tmp_path):
+    journal.mark_done(["1"])
+    other = RunJournal("other", tmp_path / "runs")
+    assert other.completed() == set()
+    other.close()
+
+
+def _criteria(**fields):
+    criteria = BibliographyCriteria()
+    for name, value in fields.items():
+        setattr(criteria, name, value)
+    return criteria
+
+
+def test_criteria_key():
+    key = criteria_key(_criteria(output="out.csv", journal="Tectonophysics"))
+    assert len(key) == 16
+    assert key == criteria_key(_criteria(journal="Tectonophysics", output="out.csv"))
+    assert key != criteria_key(_criteria(output="out.csv", journal="J. Seismol."))
+    assert key != criteria_key(_criteria(output="other.csv", journal="Tectonophysics"))
@@ -0,0 +1,70 @@
+import json
+
+import pytest
+
+from eq_fetch.quarantine import Quarantine
+
+CONTEXT = {"output": "out.csv", "format": "csv", "journal": "", "author": "", "doi": ""}
+
+
+@pytest.fixture
+def quarantine(tmp_path):
+    return Quarantine(tmp_path / "quarantine", CONTEXT)
+
+
+def test_add_and_records(quarantine):
+    assert list(quarantine.records()) == []
+    quarantine.add("2", "<html>two</html>", "bad header", "http://isc/?evid=2")
+    page = quarantine.add("1", "<html>één</html>", "too short", "http://isc/?evid=1")
+    assert page == quarantine.directory / "1.html"
+    assert quarantine.added == 2
+    records = list(quarantine.records())
+    assert [html for _, html in records] == ["<html>één</html>", "<html>two</html>"]
+    record = records[0][0]
+    assert record["evid"] == "1"
+    assert record["reason"] == "too short"
+    assert record["url"] == "http://isc/?evid=1"
+    assert record["attempts"] == 0
+    assert {key: record[key] for key in CONTEXT} == CONTEXT
+    assert not list(quarantine.directory.glob("*.tmp"))
+
+
+def test_add_replaces_earlier_copy(quarantine):
+    quarantine.add("1", "old", "too short", "url")
+    quarantine.add("1", "new", "bad header", "url")
+    [(record, html)] = quarantine.records()
+    assert (html, record["reason"]) == ("new", "bad header")
+
+
+def test_retain_counts_attempts(quarantine):
+    quarantine.add("1", "page", "too short", "url")
+    [(record, _)] = quarantine.records()
+    quarantine.retain(record, "still too short")
+    quarantine.retain(next(quarantine.records())[0], "still too short")
+    [(record, html)] = quarantine.records()
+    assert html == "page"
+    assert (record["reason"], record["attempts"]) == ("still too short", 2)
+    assert record["output"] == "out.csv"
+
+
+def test_remove(quarantine):
+    quarantine.add("1", "page", "too short", "url")
+    quarantine.add("2", "page", "too short", "url")
+    quarantine.remove("1")
+    quarantine.remove("3")
+    assert [record["evid"] for record, _ in quarantine.records()] == ["2"]
+    assert sorted(path.name for path in quarantine.directory.iterdir()) == [
+        "2.html",
+        "2.json",
+    ]
+
+
+def test_records_skip_orphans(quarantine):
+    quarantine.add("1", "page", "too short", "url")
+    (quarantine.directory / "2.json").write_text(json.dumps({"evid": "2"}))
+    (quarantine.directory / "3.html").write_text("page")
+    assert [record["evid"] for record, _ in quarantine.records()] == ["1"]
+
+
+def test_missing_directory(tmp_path):
+    assert list(Quarantine(tmp_path / "missing").records()) == []
@@ -0,0 +1,71 @@
+import random
+
+import pytest
+
+pytest.importorskip("flinnengdahl")
+
+from eq_fetch import regions  # noqa: E402
+
+
+class _ObspyRegions:
+    """obspy's port of the Flinn-Engdahl tables behind the `name` interface."""
+
+    def __init__(self):
+        from obspy.geodetics import FlinnEngdahl
+
+        self._fe = FlinnEngdahl()
+        self.calls = 0
+
+    def name(self, lat, lon):
+        self.calls += 1
+        return self._fe.get_region(lon, lat)
+
+
+def _coordinates():
+    rng = random.Random(11)
+    points = [
+        (round(rng.uniform(-90, 90), 2), round(rng.uniform(-180, 180), 2))
+        for _ in range(3000)
+    ]
+    # Aftershock-style clusters, and points on or beside cell edges.
+    points += [
+        (38.3 + rng.uniform(-0.5, 0.5), 142.4 + rng.uniform(-0.5, 0.5))
+        for _ in range(500)
+    ]
+    edges = [-180.0, -90.0, -1.0, -0.99, -0.01, 0.0, 0.01, 0.99, 1.0, 89.99, 90.0]
+    points += [(lat, lon) for lat in edges for lon in edges + [179.99, 180.0]]
+    points += [(0.5, -0.5), (-0.5, 0.5), (-0.5, -0.5), (0.5, 0.5)]
+    return [(lat, lon) for lat, lon in points if -90 <= lat <= 90]
+
+
+@pytest.fixture
+def fresh_cache():
+    regions.region_name.cache_clear()
+    yield
+    regions.region_name.cache_clear()
+
+
+def test_region_names_match_single_lookups(fresh_cache):
+    fe = regions._regionalizer()
+    lats, lons = zip(*_coordinates())
+    assert regions.region_names(lats, lons) == [
+        fe.name(lat, lon) for lat, lon in zip(lats, lons)
+    ]
+
+
+def test_region_names_one_lookup_per_cell(fresh_cache, monkeypatch):
+    fe = _ObspyRegions()
+    monkeypatch.setattr(regions, "_regionalizer", lambda: fe)
+    lats, lons = zip(*_coordinates())
+    names = regions.region_names(lats, lons)
+    calls = fe.calls
+    assert names == [fe.name(lat, lon) for lat, lon in zip(lats, lons)]
+    cells = {
+        (lat >= 0, int(abs(lat)), lon >= 0, int(abs(lon)))
+        for lat, lon in zip(lats, lons)
+    }
+    assert calls == len(cells) < len(lats)
+
+
+def test_region_names_empty():
+    assert regions.region_names([], []) == []
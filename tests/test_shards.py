@@ -0,0 +1,121 @@
+import pytest
+
+from eq_fetch import shards
+
+
+def _rows(count):
+    return [
+        (600000000 + n, 1704067200 + n, 10.0, 20.0, 30.0, 5.0, n) for n in range(count)
+    ]
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = shards.WorkQueue.create(
+        tmp_path / "run.queue", _rows(5), shard_size=2, meta={"format": "csv"}
+    )
+    yield queue
+    queue.close()
+
+
+def _publish(queue, shard, owner, text):
+    part = shards.temp_part(queue, shard, owner)
+    part.write_text(text)
+    return part, queue.complete(shard, owner, part)
+
+
+def test_create(queue, tmp_path):
+    assert [row[:3] for row in queue.status()] == [
+        (1, 2, "pending"),
+        (2, 2, "pending"),
+        (3, 1, "pending"),
+    ]
+    assert queue.events(2) == _rows(5)[2:4]
+    assert queue.meta == {"format": "csv"}
+    assert queue.parts_dir.is_dir()
+    with pytest.raises(FileExistsError):
+        shards.WorkQueue.create(queue.path, _rows(1), 1, {"format": "csv"})
+    with pytest.raises(FileNotFoundError):
+        shards.WorkQueue(tmp_path / "missing.queue")
+
+
+def test_claim_leases_each_shard_once(queue):
+    assert queue.claim("a", lease=60) == 1
+    assert queue.claim("b", lease=60) == 2
+    assert queue.claim("a", lease=60, exclude=[3]) is None
+    assert queue.claim("c", lease=60) == 3
+    assert queue.claim("c", lease=60) is None
+    assert [row[3] for row in queue.status()] == ["a", "b", "c"]
+
+
+def test_release(queue):
+    assert queue.claim("a", lease=60) == 1
+    queue.release(1, "b")
+    assert queue.status()[0][2:4] == ("leased", "a")
+    queue.release(1, "a")
+    assert queue.status()[0][2:4] == ("pending", None)
+    assert queue.claim("b", lease=60) == 1
+    assert queue.status()[0][5] == 2
+
+
+def test_heartbeat_extends_lease(queue):
+    assert queue.claim("a", lease=-1) == 1
+    assert queue.heartbeat(1, "a", lease=60)
+    # The renewed lease has not expired, so the shard is not taken over.
+    assert queue.claim("b", lease=60) == 2
+    assert not queue.heartbeat(1, "b", lease=60)
+
+
+def test_takeover_after_lease_expires(queue):
+    assert queue.claim("a", lease=-1) == 1
+    assert queue.claim("b", lease=60) == 1
+    _, _, state, owner, _, attempts = queue.status()[0]
+    assert (state, owner, attempts) == ("leased", "b", 2)
+
+    # The old owner notices on its next heartbeat and cannot publish.
+    assert not queue.heartbeat(1, "a", lease=60)
+    late, published = _publish(queue, 1, "a", "header\nfrom a\n")
+    assert not published
+    assert late.exists()
+    assert not queue.part_path(1).exists()
+
+    part, published = _publish(queue, 1, "b", "header\nfrom b\n")
+    assert published
+    assert not part.exists()
+    assert queue.part_path(1).read_text() == "header\nfrom b\n"
+    assert queue.status()[0][2] == "done"
+    assert queue.unfinished() == [2, 3]
+
+    # Nor can it once the shard is done.
+    assert not queue.heartbeat(1, "a", lease=60)
+    assert not queue.complete(1, "a", late)
+    assert queue.part_path(1).read_text() == "header\nfrom b\n"
+    assert queue.claim("a", lease=60) == 2
+
+
+def test_temp_part_removes_stale_files(queue):
+    final = queue.part_path(1)
+    stale = [
+        final.with_suffix(".deadhost-1.tmp"),
+        final.with_suffix(".deadhost-1.tmp.part"),
+    ]
+    for path in stale:
+        path.write_text("stale")
+    other = queue.part_path(2).with_suffix(".deadhost-1.tmp")
+    other.write_text("stale")
+
+    part = shards.temp_part(queue, 1, "host/2")
+    assert part == final.with_suffix(".host_2.tmp")
+    assert not any(path.exists() for path in stale)
+    assert other.exists()
+
+
+def test_merge(queue, tmp_path):
+    for shard in (1, 2, 3):
+        assert queue.claim("a", lease=60) == shard
+        _publish(queue, shard, "a", f"evid,entry\n{shard},x\n")
+        if shard == 2:
+            with pytest.raises(RuntimeError, match="not done"):
+                shards.merge(queue, tmp_path / "out.csv")
+    assert shards.merge(queue, tmp_path / "out.csv") == 3
+    assert (tmp_path / "out.csv").read_text() == "evid,entry\n1,x\n2,x\n3,x\n"
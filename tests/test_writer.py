@@ -0,0 +1,155 @@
+import csv
+
+import pytest
+
+from eq_fetch.writer import StreamingArrowWriter, StreamingCSVWriter, read_table
+
+HEADER = ["ISC_event", "Origin_Time", "Mag", "Region", "Entry"]
+REGIONS = ["Fiji Islands", "Near coast of Peru", "Crete", "Tonga Islands"]
+
+
+def _events(count):
+    """(event id, rows) pairs with one to three rows each."""
+    return [
+        (
+            str(600000000 + n),
+            [
+                [
+                    str(600000000 + n),
+                    f"2024-01-{n % 28 + 1:02d} 0{n % 10}:00:00",
+                    f"{4 + n % 5 * 0.5}",
+                    REGIONS[n * 7 % len(REGIONS)],
+                    f"entry {k} of {n}",
+                ]
+                for k in range(n % 3 + 1)
+            ],
+        )
+        for n in range(count)
+    ]
+
+
+class _Collector:
+    """`on_flush` callback recording the file's rows at each call."""
+
+    def __init__(self, path):
+        self.path = path
+        self.calls = []
+
+    def __call__(self, event_ids):
+        with open(self.path, newline="", encoding="utf-8") as f:
+            self.calls.append((event_ids, list(csv.reader(f))[1:]))
+
+
+def test_csv_on_flush_after_rows_reach_file(tmp_path):
+    path = tmp_path / "out.csv"
+    done = _Collector(path)
+    events = _events(6)
+    writer = StreamingCSVWriter(
+        path, HEADER, batch_rows=4, flush_interval=3600, on_flush=done
+    )
+    for event_id, rows in events[:3]:
+        writer.write_event(event_id, rows)
+    # Events 0 to 2 have 6 rows, which passed batch_rows at event 2.
+    assert done.calls == [
+        (
+            ["600000000", "600000001", "600000002"],
+            events[0][1] + events[1][1] + events[2][1],
+        )
+    ]
+    writer.write_event(*events[3])
+    assert len(done.calls) == 1
+    writer.close()
+    assert done.calls[1] == (
+        ["600000003"],
+        [row for _, rows in events[:4] for row in rows],
+    )
+    writer.close()
+    assert len(done.calls) == 2
+
+
+def test_csv_flush_interval(tmp_path):
+    path = tmp_path / "out.csv"
+    done = _Collector(path)
+    with StreamingCSVWriter(
+        path, HEADER, batch_rows=1000, flush_interval=0, on_flush=done
+    ) as writer:
+        for event_id, rows in _events(3):
+            writer.write_event(event_id, rows)
+    assert [event_ids for event_ids, _ in done.calls] == [
+        ["600000000"],
+        ["600000001"],
+        ["600000002"],
+    ]
+
+
+def test_csv_append(tmp_path):
+    path = tmp_path / "out.csv"
+    events = _events(5)
+    with StreamingCSVWriter(path, HEADER) as writer:
+        for event_id, rows in events[:2]:
+            writer.write_event(event_id, rows)
+    with StreamingCSVWriter(path, HEADER, append=True) as writer:
+        for event_id, rows in events[2:]:
+            writer.write_event(event_id, rows)
+    with open(path, newline="", encoding="utf-8") as f:
+        assert list(csv.reader(f)) == [HEADER] + [
+            row for _, rows in events for row in rows
+        ]
+
+
+def _schema():
+    pa = pytest.importorskip("pyarrow")
+    return pa.schema(
+        [
+            ("ISC_event", pa.int64()),
+            ("Origin_Time", pa.timestamp("us", tz="UTC")),
+            ("Mag", pa.float32()),
+            ("Region", pa.dictionary(pa.int32(), pa.string())),
+            ("Entry", pa.string()),
+        ]
+    )
+
+
+def _write(path, events, fmt, append=False, done=None):
+    with StreamingArrowWriter(
+        path, _schema(), fmt=fmt, append=append, batch_rows=8, on_flush=done
+    ) as writer:
+        for event_id, rows in events:
+            writer.write_event(event_id, rows)
+
+
+@pytest.mark.parametrize("fmt", ["parquet", "feather"])
+def test_appending_writes_the_same_file(tmp_path, fmt):
+    events = _events(20)
+    _write(tmp_path / "whole", events, fmt)
+    for start, stop in [(0, 5), (5, 6), (6, 6), (6, 20)]:
+        _write(tmp_path / "pieces", events[start:stop], fmt, append=True)
+    assert (tmp_path / "pieces").read_bytes() == (tmp_path / "whole").read_bytes()
+    table = read_table(tmp_path / "whole", fmt)
+    assert table.schema == _schema()
+    assert table.num_rows == sum(len(rows) for _, rows in events)
+    assert table["Region"].to_pylist() == [row[3] for _, rows in events for row in rows]
+
+
+def test_row_groups_hold_batch_rows(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    _write(tmp_path / "out.parquet", _events(20), "parquet")
+    metadata = pq.ParquetFile(tmp_path / "out.parquet").metadata
+    sizes = [metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)]
+    # 39 rows, however the events split them.
+    assert sizes == [8, 8, 8, 8, 7]
+
+
+def test_on_flush_after_replace(tmp_path):
+    path = tmp_path / "out.parquet"
+    done = []
+
+    def on_flush(event_ids):
+        # The events are reported only once the finished file is in place.
+        assert path.exists()
+        done.extend(event_ids)
+
+    events = _events(20)
+    _write(path, events, "parquet", done=on_flush)
+    assert done == [event_id for event_id, _ in events]
+    assert not path.with_name(path.name + ".part").exists()